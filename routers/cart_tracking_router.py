@@ -4,35 +4,123 @@ Track add to cart and remove from cart history for users
 """
 
 from fastapi import APIRouter, Query, BackgroundTasks, Path
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Any, List
 from datetime import datetime, timedelta
-import random
-import uuid
+import secrets
+import threading
+import numpy as np
 from pathlib import Path as FilePath
+import asyncio
+import fcntl
 import gzip
+import heapq
 import json
+import orjson
+import os
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from operator import itemgetter
+
+import shared.data_generator as data_generator
 
 from shared.data_generator import (
-    get_random_customer, get_random_product,
     get_private_data_path, fake_vi, fake_en,
     SHARED_PRODUCTS, ensure_products_loaded
 )
 
-router = APIRouter()
+# orjson encodes the large event lists several times faster than stdlib json
+router = APIRouter(default_response_class=ORJSONResponse)
 
 # Configuration
 TRACKING_DIR = get_private_data_path("cart_tracking", "")
 TRACKING_DIR.mkdir(exist_ok=True)
 
+# gzip level for cart_events.json.gz: level 1 was barely faster than 6 while
+# producing files ~43% larger
+GZIP_COMPRESS_LEVEL = 6
+# Events encoded per write when saving
+SAVE_CHUNK_SIZE = 10000
+
+# Generated events are spread uniformly over the last 91 days
+MAX_EVENT_AGE_SECONDS = 91 * 86400
+
+# Codebooks for the low-cardinality event fields. Generation picks values by
+# code and the cached columns store codes instead of strings; values outside
+# a codebook (older data) get extra codes when the columns are built.
+EVENT_TYPES = (
+    "add_to_cart", "remove_from_cart", "update_quantity", "view_item",
+    "purchase", "scroll", "exit_page", "search", "add_to_wish_list",
+    "begin_checkout", "add_shipping_info", "add_payment_info",
+    "payment_failed", "order_cancelled"
+)
+SOURCES = ("website", "mobile_app", "mobile_web")
+DEVICES = ("desktop", "mobile", "tablet")
+EVENT_TYPE_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+# Choice values for generated events
+BROWSERS = ("Chrome", "Safari", "Firefox", "Edge", "Mobile App")
+USER_AGENT_OSES = ("Windows NT 10.0", "Macintosh", "Linux", "iPhone", "Android")
+REFERRERS = (
+    "https://google.com",
+    "https://facebook.com",
+    "https://techstore.vn/category/laptop",
+    "https://techstore.vn/",
+    None
+)
+UTM_SOURCES = ("google", "facebook", "direct", "email", None)
+UTM_MEDIUMS = ("cpc", "organic", "social", "email", None)
+UTM_CAMPAIGNS = ("summer_sale", "black_friday", "new_arrival", None)
+PAYMENT_METHODS = ("credit_card", "paypal", "momo", "zalopay", "cod")
+SHIPPING_METHODS = ("standard", "express", "same_day")
+EXIT_TYPES = ("close_tab", "back_button", "navigate_away")
+SEARCH_TERMS = (
+    "laptop", "phone", "headphones", "keyboard", "mouse",
+    "monitor", "tablet", "camera", "smartwatch", "speaker"
+)
+SEARCH_TYPES = ("keyword", "category", "brand")
+FAILURE_REASONS = (
+    "insufficient_funds", "card_declined", "expired_card",
+    "network_error", "timeout", "invalid_cvv"
+)
+CANCELLED_BY_OPTIONS = ("customer", "system", "admin")
+CANCELLATION_REASONS = (
+    "changed_mind", "found_better_price", "delivery_too_slow",
+    "payment_issue", "out_of_stock", "duplicate_order"
+)
+
+# Large generations are split into shards and built in worker processes
+GENERATION_SHARD_SIZE = 10000
+# One worker per core; the pool only forks once the first shard is submitted
+GENERATION_WORKERS = os.cpu_count() or 1
+_gen_pool = ProcessPoolExecutor(max_workers=GENERATION_WORKERS)
+
+# Written by the generation thread with single update() calls that replace
+# "cart_events" as a whole; readers take one copy() so they always see a
+# consistent progress snapshot
 generation_status = {
     "cart_events": {"generated": 0, "target": 10000, "completed": False},
+    "job_id": None,
     "is_generating": False,
     "start_time": None,
     "estimated_completion_time": None,
     "progress_percentage": 0
 }
 
+# Held for the whole generation job (released by the background task); the
+# file lock extends it to other processes sharing the data directory
+_gen_lock = threading.Lock()
+
+# Parsed cart_events.json.gz, reused across requests until the file changes.
+# "view" holds the events together with everything derived from them and is
+# replaced as a whole, so a request never mixes row ids from two generations
+_events_cache = {
+    "mtime": None,
+    "view": None,
+    "lock": asyncio.Lock()
+}
+
 # Standard Response Model
 class StandardResponse(BaseModel):
     status: str = Field(..., example="success")
@@ -42,336 +130,739 @@ class StandardResponse(BaseModel):
     total: Optional[int] = Field(None)
 
 # Helper functions
+def _fast_response(content):
+    """Encode a StandardResponse-shaped dict with orjson directly, skipping Pydantic validation"""
+    return ORJSONResponse({
+        "status": content["status"],
+        "msg": content["msg"],
+        "data": content.get("data"),
+        "count": content.get("count"),
+        "total": content.get("total")
+    })
+
 def save_compressed(data, filepath):
-    with gzip.open(filepath, 'wt', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False)
+    # Stream the JSON array in orjson-encoded chunks so a large event list
+    # never has to exist as one encoded bytes object as well
+    with gzip.open(filepath, 'wb', compresslevel=GZIP_COMPRESS_LEVEL) as f:
+        f.write(b"[")
+        for start in range(0, len(data), SAVE_CHUNK_SIZE):
+            if start:
+                f.write(b",")
+            f.write(orjson.dumps(data[start:start + SAVE_CHUNK_SIZE])[1:-1])
+        f.write(b"]")
 
 def load_compressed(filepath):
     if not filepath.exists():
         return None
-    with gzip.open(filepath, 'rt', encoding='utf-8') as f:
-        return json.load(f)
+    with gzip.open(filepath, 'rb') as f:
+        return orjson.loads(f.read())
 
-def generate_session_id():
-    """Generate user session ID"""
-    return f"sess_{uuid.uuid4().hex[:16]}"
+def _acquire_generation_lock():
+    """Take the in-process and cross-process generation locks without blocking, or return None"""
+    if not _gen_lock.acquire(blocking=False):
+        return None
+    lock_file = open(TRACKING_DIR / "cart_events.json.gz.lock", 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        _gen_lock.release()
+        return None
+    return lock_file
 
-def generate_cart_events_batch(count):
-    """Generate cart tracking events with extended event types"""
-    events = []
+def _release_generation_lock(lock_file):
+    """Release the locks taken by _acquire_generation_lock"""
+    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    lock_file.close()
+    _gen_lock.release()
 
-    # Extended event types list
-    event_types = [
-        "add_to_cart", "remove_from_cart", "update_quantity", "view_item",
-        "purchase", "scroll", "exit_page", "search", "add_to_wish_list",
-        "begin_checkout", "add_shipping_info", "add_payment_info",
-        "payment_failed", "order_cancelled"
-    ]
-    sources = ["website", "mobile_app", "mobile_web"]
-    devices = ["desktop", "mobile", "tablet"]
-    browsers = ["Chrome", "Safari", "Firefox", "Edge", "Mobile App"]
+def _write_events_meta(batch_file, count):
+    """Record the event count next to the events file, keyed by its mtime"""
+    meta = {"count": count, "mtime_ns": batch_file.stat().st_mtime_ns}
+    with open(TRACKING_DIR / "cart_events.meta.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
 
-    # Generate user sessions (group events by session)
-    # ~30% of sessions are guest users (no customer_id)
-    num_sessions = count // 10  # Average 10 events per session
-    sessions = {}
+def _build_row_index(column):
+    """
+    Group row ids by column value: rows stably sorted by value (so each group
+    stays in timestamp order) plus the sorted values for searchsorted lookups
+    """
+    order = np.argsort(column, kind="stable")
+    return {"keys": column[order], "rows": order}
+
+def _index_rows(index, key):
+    """Row ids (ascending, i.e. oldest first) whose indexed value equals key"""
+    keys = index["keys"]
+    lo = np.searchsorted(keys, key, side="left")
+    hi = np.searchsorted(keys, key, side="right")
+    return index["rows"][lo:hi]
+
+def _build_event_indexes(columns):
+    """Row-id indexes by customer, product and session, built from the cached columns"""
+    return {
+        "by_customer": _build_row_index(columns["customer_id"]),
+        "by_product": _build_row_index(columns["product_id"]),
+        "by_session": _build_row_index(columns["session_id"])
+    }
 
-    for _ in range(num_sessions):
-        session_id = generate_session_id()
-        is_guest = random.random() < 0.3  # 30% guest users
+def _encode_column(events, field, names):
+    """Encode a string field as int16 codes against a codebook, extending it for unseen values"""
+    codebook = {name: code for code, name in enumerate(names)}
+    lookup = codebook.get
+    codes = np.fromiter((lookup(e.get(field, "unknown"), -1) for e in events), dtype=np.int16, count=len(events))
+    for k in np.flatnonzero(codes < 0).tolist():
+        codes[k] = codebook.setdefault(str(events[k].get(field, "unknown")), len(codebook))
+    return codes, list(codebook)
+
+def _column_code(columns, field, value):
+    """Code of value in an encoded column's codebook, or -1 (matches no row)"""
+    try:
+        return columns[f"{field}_names"].index(value)
+    except ValueError:
+        return -1
 
-        if is_guest:
-            customer_id = None
-        else:
-            customer = get_random_customer()
-            customer_id = customer["id"]
-
-        sessions[session_id] = {
-            "customer_id": customer_id,
-            "is_guest": is_guest,
-            "source": random.choice(sources),
-            "device": random.choice(devices),
-            "browser": random.choice(browsers),
-            "ip_address": f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",
-            "user_agent": f"Mozilla/5.0 ({random.choice(['Windows NT 10.0', 'Macintosh', 'Linux', 'iPhone', 'Android'])})"
-        }
+def _build_event_columns(events):
+    """
+    Columnar NumPy copies of the fields the aggregations read, aligned with the
+    (timestamp-sorted) events list. Missing ids are stored as 0 / "" and a
+    missing quantity as -1. Timestamps are parsed once into datetime64, and
+    event_type/source/device are stored as codes with a "<field>_names" list.
+    """
+    n = len(events)
+    event_type, event_type_names = _encode_column(events, "event_type", EVENT_TYPES)
+    source, source_names = _encode_column(events, "source", SOURCES)
+    device, device_names = _encode_column(events, "device", DEVICES)
+    return {
+        "timestamp": np.array(
+            [e.get("timestamp", "").replace("Z", "+00:00").replace("+00:00", "") or "NaT" for e in events],
+            dtype="datetime64[us]"
+        ),
+        "event_type": event_type,
+        "event_type_names": event_type_names,
+        "source": source,
+        "source_names": source_names,
+        "device": device,
+        "device_names": device_names,
+        "customer_id": np.fromiter((e.get("customer_id") or 0 for e in events), dtype=np.int64, count=n),
+        "session_id": np.array([e.get("session_id") or "" for e in events]),
+        "product_id": np.fromiter((e.get("product_id") or 0 for e in events), dtype=np.int64, count=n),
+        "quantity": np.fromiter((e.get("quantity", -1) for e in events), dtype=np.int64, count=n),
+        "line_total_vnd": np.fromiter((e.get("line_total_vnd", 0) for e in events), dtype=np.int64, count=n)
+    }
 
-    session_ids = list(sessions.keys())
+def _build_session_state(events, columns, session_index):
+    """
+    Fold each session's cart events once to get its final cart and last activity.
+    Only sessions that still have items in the cart are kept, as parallel
+    lists plus NumPy arrays for the columns the abandoned-cart query filters on.
+    """
+    session_state = {
+        "session_id": [],
+        "customer_id": [],
+        "last_activity": [],
+        "cart_items": []
+    }
+    cart_values = []
+    last_activity_rows = []
+
+    # Session groups in the row index, visited in first-activity order
+    keys = session_index["keys"]
+    rows = session_index["rows"]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+    ends = np.r_[starts[1:], len(keys)][:len(starts)].astype(np.int64)
+    group_order = np.argsort(rows[starts], kind="stable")
+
+    # Cart operations in session order: 1 add, 2 remove, 3 update, 0 anything else
+    event_type = columns["event_type"][rows]
+    product_id = columns["product_id"][rows]
+    cart_op = np.select(
+        [
+            event_type == EVENT_TYPE_CODES["add_to_cart"],
+            event_type == EVENT_TYPE_CODES["remove_from_cart"],
+            event_type == EVENT_TYPE_CODES["update_quantity"]
+        ],
+        [1, 2, 3],
+        0
+    ).astype(np.int8)
+    cart_op[product_id == 0] = 0
+
+    # A cart can only be non-empty if the session added something, so only
+    # those sessions are folded, and only over their cart-operation rows
+    has_add = np.add.reduceat(cart_op == 1, starts) > 0 if len(starts) else np.array([], dtype=bool)
+    cart_positions = np.flatnonzero(cart_op)
+    group_cart_start = np.searchsorted(cart_positions, starts)
+    group_cart_end = np.searchsorted(cart_positions, ends)
+
+    # Session rows are timestamp-sorted, so the first row carries the customer
+    # and the last one the latest activity
+    first_rows = rows[starts]
+    last_rows = rows[ends - 1]
+
+    cart_op = cart_op.tolist()
+    product_id = product_id.tolist()
+    quantity = columns["quantity"][rows].tolist()
+    row_ids = rows.tolist()
+    cart_positions = cart_positions.tolist()
+
+    for g in group_order[has_add[group_order]].tolist():
+        sid = keys[starts[g]]
+        if not sid:
+            continue
 
-    for i in range(count):
-        session_id = random.choice(session_ids)
-        session = sessions[session_id]
-        product = get_random_product()
+        cart = {}
+        for pos in cart_positions[group_cart_start[g]:group_cart_end[g]]:
+            pid = product_id[pos]
+            op = cart_op[pos]
+            qty = quantity[pos]
+            if op == 1:
+                item = cart.get(pid)
+                if item is None:
+                    e = events[row_ids[pos]]
+                    item = cart[pid] = {"product": e.get("product_name"), "quantity": 0, "price": e.get("product_price_vnd", 0)}
+                item["quantity"] += qty if qty >= 0 else 1
+            else:
+                item = cart.get(pid)
+                if item is not None:
+                    if op == 2:
+                        item["quantity"] -= qty if qty >= 0 else 1
+                    else:
+                        item["quantity"] = qty if qty >= 0 else 0
+                    if item["quantity"] <= 0:
+                        del cart[pid]
 
-        if not product:
+        last_activity = events[last_rows[g]].get("timestamp", "")
+        if not cart or not last_activity:
             continue
 
-        event_time = datetime.now() - timedelta(
-            days=random.randint(0, 90),
-            hours=random.randint(0, 23),
-            minutes=random.randint(0, 59),
-            seconds=random.randint(0, 59)
-        )
+        session_state["session_id"].append(str(sid))
+        session_state["customer_id"].append(events[first_rows[g]].get("customer_id"))
+        session_state["last_activity"].append(last_activity)
+        last_activity_rows.append(last_rows[g])
+        session_state["cart_items"].append(list(cart.values()))
+        cart_values.append(sum(item["price"] * item["quantity"] for item in cart.values()))
+
+    session_state["last_activity_dt"] = columns["timestamp"][np.array(last_activity_rows, dtype=np.int64)]
+    session_state["cart_value_vnd"] = np.array(cart_values, dtype=np.int64)
+    return session_state
+
+def _update_events_cache(events, mtime):
+    """Publish freshly loaded/generated events (and everything derived from them) to the cache"""
+    events = events or []
+    # Sorted by timestamp so row order, and every index group, is chronological
+    if any(events[i]["timestamp"] > events[i + 1]["timestamp"] for i in range(len(events) - 1)):
+        events.sort(key=itemgetter("timestamp"))
+    columns = _build_event_columns(events)
+    indexes = _build_event_indexes(columns)
+    view = {
+        "events": events,
+        "columns": columns,
+        "indexes": indexes,
+        "session_state": _build_session_state(events, columns, indexes["by_session"])
+    }
+    _events_cache["mtime"] = None
+    _events_cache["view"] = view
+    _events_cache["mtime"] = mtime
+
+async def get_events_view():
+    """Get cart events and their indexes, only decompressing the file again when its mtime changes"""
+    batch_file = TRACKING_DIR / "cart_events.json.gz"
+    try:
+        mtime = batch_file.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    view = _events_cache["view"]
+    if _events_cache["mtime"] == mtime:
+        return view
+
+    async with _events_cache["lock"]:
+        # Another request may have reloaded the file while we waited
+        if _events_cache["mtime"] != mtime:
+            # Decompress/parse in a worker thread so the event loop keeps serving
+            events = await asyncio.to_thread(load_compressed, batch_file)
+            await asyncio.to_thread(_update_events_cache, events, mtime)
+        return _events_cache["view"]
+
+async def get_event_count():
+    """Get the number of stored events without decompressing the file when possible"""
+    batch_file = TRACKING_DIR / "cart_events.json.gz"
+    try:
+        mtime = batch_file.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+    view = _events_cache["view"]
+    if _events_cache["mtime"] == mtime:
+        return len(view["events"])
+
+    try:
+        with open(TRACKING_DIR / "cart_events.meta.json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("mtime_ns") == mtime:
+            return meta["count"]
+    except (FileNotFoundError, ValueError):
+        pass
+
+    # No (or stale) sidecar, e.g. a file written by an older version
+    view = await get_events_view()
+    return len(view["events"]) if view else 0
+
+def generate_session_id(run_prefix, index):
+    """Generate user session ID from a per-batch random prefix and a counter"""
+    return f"sess_{run_prefix}{index:06x}"
+
+def _masked_integers(rng, mask, low, high):
+    """Draw integers in [low, high] only for the rows selected by mask (0 elsewhere)"""
+    column = np.zeros(len(mask), dtype=np.int64)
+    column[mask] = rng.integers(low, high, int(mask.sum()), endpoint=True)
+    return column
+
+def _take(choices, idx):
+    """Resolve an array of choice indexes to their values with a C-level take"""
+    return np.array(choices, dtype=object)[idx].tolist()
+
+def generate_cart_events_batch(count, products):
+    """Generate cart tracking events with extended event types"""
+    events = []
+    if not products:
+        return events
+
+    # One random prefix per batch keeps IDs unique across runs; a counter
+    # keeps them unique within the batch without a urandom read per ID
+    run_prefix = secrets.token_hex(6)
+
+    event_types = EVENT_TYPES  # local name, indexed once per event
+
+    # Draw every random column up front in NumPy; the loops below only index
+    # into these (tolist() gives plain Python ints/bools for JSON output)
+    rng = np.random.default_rng()
+
+    # Generate user sessions (group events by session) as parallel lists
+    # indexed by session number
+    # ~30% of sessions are guest users (no customer_id)
+    num_sessions = max(count // 10, 1)  # Average 10 events per session
+
+    session_is_guest = (rng.random(num_sessions) < 0.3).tolist()  # 30% guest users
+    session_source_idx = rng.integers(0, len(SOURCES), num_sessions).tolist()
+    session_device_idx = rng.integers(0, len(DEVICES), num_sessions).tolist()
+    session_browser_idx = rng.integers(0, len(BROWSERS), num_sessions).tolist()
+    session_os_idx = rng.integers(0, len(USER_AGENT_OSES), num_sessions).tolist()
+    session_ip_octets = rng.integers(1, 256, (num_sessions, 4)).tolist()
+    # Same 1..2,000,000 id range as get_random_customer(), drawn in one call
+    session_customer_ids = rng.integers(1, 2_000_001, num_sessions).tolist()
+
+    session_ids = [generate_session_id(run_prefix, j) for j in range(num_sessions)]
+    session_customer_ids = [
+        None if is_guest else customer_id
+        for is_guest, customer_id in zip(session_is_guest, session_customer_ids)
+    ]
+    session_sources = [SOURCES[k] for k in session_source_idx]
+    session_devices = [DEVICES[k] for k in session_device_idx]
+    session_browsers = [BROWSERS[k] for k in session_browser_idx]
+    session_ips = ["{}.{}.{}.{}".format(*octets) for octets in session_ip_octets]
+    session_user_agents = [f"Mozilla/5.0 ({USER_AGENT_OSES[k]})" for k in session_os_idx]
+
+    session_picks = rng.integers(0, num_sessions, count).tolist()
+    product_picks = rng.integers(0, len(products), count)
+    product_idx = product_picks.tolist()
+    event_type_codes = rng.integers(0, len(event_types), count, dtype=np.int8)
+    # Picks are resolved to values up front, so the loop reads each value
+    # with a single list index
+    event_referrers = _take(REFERRERS, rng.integers(0, len(REFERRERS), count))
+    event_utm_sources = _take(UTM_SOURCES, rng.integers(0, len(UTM_SOURCES), count))
+    event_utm_mediums = _take(UTM_MEDIUMS, rng.integers(0, len(UTM_MEDIUMS), count))
+    event_utm_campaigns = _take(UTM_CAMPAIGNS, rng.integers(0, len(UTM_CAMPAIGNS), count))
+
+    # Per-product event fields and URLs are built once per catalog entry
+    # rather than per event; events pick them by product index
+    product_fields = [
+        {
+            "product_id": p["id"],
+            "product_name": p["name"],
+            "product_sku": p["sku"],
+            "product_category": p["category"],
+            "product_brand": p["brand"],
+            "product_price_vnd": p["price_vnd"],
+            "product_price_usd": p["price_usd"],
+        }
+        for p in products
+    ]
+    product_urls = [f"https://techstore.vn/product/{p['id']}" for p in products]
+
+    # Event-type specific columns: one boolean mask per type, and each column
+    # is only filled for the rows of the types that use it
+    is_type = {name: event_type_codes == code for code, name in enumerate(event_types)}
+
+    # Cart quantities: removes sometimes (30%) take everything out, updates
+    # set a new quantity of 0-10 and remember the old one
+    is_cart = is_type["add_to_cart"] | is_type["remove_from_cart"] | is_type["update_quantity"]
+    quantity = _masked_integers(rng, is_cart, 1, 5)
+    quantity[is_type["remove_from_cart"] & (rng.random(count) > 0.7)] = 0
+    quantity[is_type["update_quantity"]] = rng.integers(0, 10, int(is_type["update_quantity"].sum()), endpoint=True)
+    quantities = quantity.tolist()
+    # Line totals for every row in one multiply; quantity is 0 outside cart rows.
+    # USD prices have two decimals, so the product is never a rounding tie and
+    # np.round matches round()
+    price_vnd = np.array([p["price_vnd"] for p in products], dtype=np.int64)
+    price_usd = np.array([p["price_usd"] for p in products], dtype=np.float64)
+    line_totals_vnd = (price_vnd[product_picks] * quantity).tolist()
+    line_totals_usd = np.round(price_usd[product_picks] * quantity, 2).tolist()
+    old_quantities = _masked_integers(rng, is_type["update_quantity"], 1, 5).tolist()
+
+    view_durations = _masked_integers(rng, is_type["view_item"], 5, 300).tolist()
+    item_counts = _masked_integers(rng, is_type["purchase"] | is_type["begin_checkout"], 1, 5).tolist()
+    order_amounts = _masked_integers(
+        rng, is_type["purchase"] | is_type["payment_failed"] | is_type["order_cancelled"], 500000, 50000000
+    ).tolist()
+    cart_values = _masked_integers(rng, is_type["begin_checkout"], 500000, 20000000).tolist()
+    payment_method_idx = _masked_integers(rng, is_type["purchase"] | is_type["add_payment_info"], 0, 4)
+    # Cash on delivery cannot fail, so failed payments pick from the first four
+    payment_method_idx[is_type["payment_failed"]] = rng.integers(0, 4, int(is_type["payment_failed"].sum()))
+    payment_methods = _take(PAYMENT_METHODS, payment_method_idx)
+    shipping_methods = _take(SHIPPING_METHODS, _masked_integers(rng, is_type["purchase"] | is_type["add_shipping_info"], 0, 2))
+    scroll_depths = _masked_integers(rng, is_type["scroll"], 10, 100).tolist()
+    page_heights = _masked_integers(rng, is_type["scroll"], 1000, 5000).tolist()
+    scroll_positions = _masked_integers(rng, is_type["scroll"], 100, 5000).tolist()
+    time_on_page = _masked_integers(rng, is_type["exit_page"], 5, 600).tolist()
+    exit_types = _take(EXIT_TYPES, _masked_integers(rng, is_type["exit_page"], 0, 2))
+    search_terms = _take(SEARCH_TERMS, _masked_integers(rng, is_type["search"], 0, len(SEARCH_TERMS) - 1))
+    results_counts = _masked_integers(rng, is_type["search"], 0, 100).tolist()
+    search_types = _take(SEARCH_TYPES, _masked_integers(rng, is_type["search"], 0, 2))
+    shipping_costs = _masked_integers(rng, is_type["add_shipping_info"], 0, 100000).tolist()
+    delivery_days = _masked_integers(rng, is_type["add_shipping_info"], 1, 7).tolist()
+    save_payment_info = _masked_integers(rng, is_type["add_payment_info"], 0, 1).astype(bool).tolist()
+    failure_reasons = _take(FAILURE_REASONS, _masked_integers(rng, is_type["payment_failed"], 0, len(FAILURE_REASONS) - 1))
+    cancelled_by = _take(CANCELLED_BY_OPTIONS, _masked_integers(rng, is_type["order_cancelled"], 0, 2))
+    cancellation_reasons = _take(
+        CANCELLATION_REASONS, _masked_integers(rng, is_type["order_cancelled"], 0, len(CANCELLATION_REASONS) - 1)
+    )
+    event_type_codes = event_type_codes.tolist()
+
+    # Order ids: 10 hex chars (5 random bytes) per event, from one urandom read
+    order_hex = os.urandom(5 * count).hex().upper()
+
+    # Event times: up to 90 days, 23 hours, 59 minutes and 59 seconds ago.
+    # Independent uniform day/hour/minute/second draws are the same as one
+    # uniform draw over the whole range in seconds.
+    now = datetime.now()
+    offsets = rng.integers(0, MAX_EVENT_AGE_SECONDS, count)
+    # Timestamps are drawn independently of every other column, so sorting
+    # the offsets (largest = oldest first) yields the batch in timestamp order
+    # without sorting the event dicts afterwards
+    offsets = np.sort(offsets)[::-1]
+    event_times = np.datetime64(now, "us") - offsets.astype("timedelta64[s]")
+    timestamps = np.datetime_as_string(event_times, unit="us").tolist()
+    timestamps_unix = (int(now.timestamp() * 1000) - offsets * 1000).tolist()
+
+    # Bound once; the loop below runs for every event
+    append_event = events.append
+    cart_event_types = frozenset(("add_to_cart", "remove_from_cart", "update_quantity"))
 
-        event_type = random.choice(event_types)
+    for i in range(count):
+        j = session_picks[i]
+        k = product_idx[i]
+        event_type = event_types[event_type_codes[i]]
 
         # Base event structure
         event = {
-            "event_id": f"evt_{uuid.uuid4().hex[:12]}",
+            "event_id": f"evt_{run_prefix}{i:06x}",
             "event_type": event_type,
-            "timestamp": event_time.isoformat(),
-            "timestamp_unix": int(event_time.timestamp() * 1000),
+            "timestamp": timestamps[i],
+            "timestamp_unix": timestamps_unix[i],
 
             # Session info
-            "session_id": session_id,
-            "customer_id": session["customer_id"],  # Can be None for guest users
-            "is_guest": session["is_guest"],
+            "session_id": session_ids[j],
+            "customer_id": session_customer_ids[j],  # Can be None for guest users
+            "is_guest": session_is_guest[j],
 
             # Context info
-            "source": session["source"],
-            "device": session["device"],
-            "browser": session["browser"],
-            "ip_address": session["ip_address"],
-            "user_agent": session["user_agent"],
+            "source": session_sources[j],
+            "device": session_devices[j],
+            "browser": session_browsers[j],
+            "ip_address": session_ips[j],
+            "user_agent": session_user_agents[j],
 
             # Page context
-            "page_url": f"https://techstore.vn/product/{product['id']}",
-            "referrer": random.choice([
-                "https://google.com",
-                "https://facebook.com",
-                "https://techstore.vn/category/laptop",
-                "https://techstore.vn/",
-                None
-            ]),
+            "page_url": product_urls[k],
+            "referrer": event_referrers[i],
 
             # UTM tracking
-            "utm_source": random.choice(["google", "facebook", "direct", "email", None]),
-            "utm_medium": random.choice(["cpc", "organic", "social", "email", None]),
-            "utm_campaign": random.choice(["summer_sale", "black_friday", "new_arrival", None]),
+            "utm_source": event_utm_sources[i],
+            "utm_medium": event_utm_mediums[i],
+            "utm_campaign": event_utm_campaigns[i],
         }
 
         # Add event-specific data
-        if event_type in ["add_to_cart", "remove_from_cart", "update_quantity"]:
-            quantity = random.randint(1, 5)
-
-            # For remove events, sometimes remove all
-            if event_type == "remove_from_cart" and random.random() > 0.7:
-                quantity = 0
-
-            # For update events, set new quantity
-            old_quantity = None
-            if event_type == "update_quantity":
-                old_quantity = random.randint(1, 5)
-                quantity = random.randint(0, 10)
-
+        if event_type in cart_event_types:
+            event.update(product_fields[k])
             event.update({
-                "product_id": product["id"],
-                "product_name": product["name"],
-                "product_sku": product["sku"],
-                "product_category": product["category"],
-                "product_brand": product["brand"],
-                "product_price_vnd": product["price_vnd"],
-                "product_price_usd": product["price_usd"],
-                "quantity": quantity,
-                "old_quantity": old_quantity,
-                "line_total_vnd": product["price_vnd"] * quantity,
-                "line_total_usd": round(product["price_usd"] * quantity, 2),
+                "quantity": quantities[i],
+                "old_quantity": old_quantities[i] if event_type == "update_quantity" else None,
+                "line_total_vnd": line_totals_vnd[i],
+                "line_total_usd": line_totals_usd[i],
             })
 
         elif event_type == "view_item":
+            event.update(product_fields[k])
             event.update({
-                "product_id": product["id"],
-                "product_name": product["name"],
-                "product_sku": product["sku"],
-                "product_category": product["category"],
-                "product_brand": product["brand"],
-                "product_price_vnd": product["price_vnd"],
-                "product_price_usd": product["price_usd"],
-                "view_duration_seconds": random.randint(5, 300),
+                "view_duration_seconds": view_durations[i],
             })
 
         elif event_type == "purchase":
-            num_items = random.randint(1, 5)
-            total_vnd = random.randint(500000, 50000000)
+            total_vnd = order_amounts[i]
             event.update({
-                "order_id": f"ORD_{uuid.uuid4().hex[:10].upper()}",
+                "order_id": f"ORD_{order_hex[i * 10:i * 10 + 10]}",
                 "total_amount_vnd": total_vnd,
                 "total_amount_usd": round(total_vnd / 24000, 2),
-                "item_count": num_items,
-                "payment_method": random.choice(["credit_card", "paypal", "momo", "zalopay", "cod"]),
-                "shipping_method": random.choice(["standard", "express", "same_day"]),
+                "item_count": item_counts[i],
+                "payment_method": payment_methods[i],
+                "shipping_method": shipping_methods[i],
             })
 
         elif event_type == "scroll":
             event.update({
-                "scroll_depth_percent": random.randint(10, 100),
-                "page_height": random.randint(1000, 5000),
-                "scroll_position": random.randint(100, 5000),
+                "scroll_depth_percent": scroll_depths[i],
+                "page_height": page_heights[i],
+                "scroll_position": scroll_positions[i],
             })
 
         elif event_type == "exit_page":
             event.update({
-                "time_on_page_seconds": random.randint(5, 600),
-                "exit_type": random.choice(["close_tab", "back_button", "navigate_away"]),
+                "time_on_page_seconds": time_on_page[i],
+                "exit_type": exit_types[i],
             })
 
         elif event_type == "search":
-            search_terms = [
-                "laptop", "phone", "headphones", "keyboard", "mouse",
-                "monitor", "tablet", "camera", "smartwatch", "speaker"
-            ]
             event.update({
-                "search_query": random.choice(search_terms),
-                "results_count": random.randint(0, 100),
-                "search_type": random.choice(["keyword", "category", "brand"]),
+                "search_query": search_terms[i],
+                "results_count": results_counts[i],
+                "search_type": search_types[i],
             })
 
         elif event_type == "add_to_wish_list":
-            event.update({
-                "product_id": product["id"],
-                "product_name": product["name"],
-                "product_sku": product["sku"],
-                "product_category": product["category"],
-                "product_brand": product["brand"],
-                "product_price_vnd": product["price_vnd"],
-                "product_price_usd": product["price_usd"],
-            })
+            event.update(product_fields[k])
 
         elif event_type == "begin_checkout":
-            num_items = random.randint(1, 5)
-            cart_value = random.randint(500000, 20000000)
+            cart_value = cart_values[i]
             event.update({
                 "cart_value_vnd": cart_value,
                 "cart_value_usd": round(cart_value / 24000, 2),
-                "item_count": num_items,
+                "item_count": item_counts[i],
             })
 
         elif event_type == "add_shipping_info":
             event.update({
-                "shipping_method": random.choice(["standard", "express", "same_day"]),
-                "shipping_cost_vnd": random.randint(0, 100000),
-                "estimated_delivery_days": random.randint(1, 7),
+                "shipping_method": shipping_methods[i],
+                "shipping_cost_vnd": shipping_costs[i],
+                "estimated_delivery_days": delivery_days[i],
             })
 
         elif event_type == "add_payment_info":
             event.update({
-                "payment_method": random.choice(["credit_card", "paypal", "momo", "zalopay", "cod"]),
-                "save_payment_info": random.choice([True, False]),
+                "payment_method": payment_methods[i],
+                "save_payment_info": save_payment_info[i],
             })
 
         elif event_type == "payment_failed":
             event.update({
-                "order_id": f"ORD_{uuid.uuid4().hex[:10].upper()}",
-                "payment_method": random.choice(["credit_card", "paypal", "momo", "zalopay"]),
-                "failure_reason": random.choice([
-                    "insufficient_funds", "card_declined", "expired_card",
-                    "network_error", "timeout", "invalid_cvv"
-                ]),
-                "attempted_amount_vnd": random.randint(500000, 50000000),
+                "order_id": f"ORD_{order_hex[i * 10:i * 10 + 10]}",
+                "payment_method": payment_methods[i],
+                "failure_reason": failure_reasons[i],
+                "attempted_amount_vnd": order_amounts[i],
             })
 
         elif event_type == "order_cancelled":
             event.update({
-                "order_id": f"ORD_{uuid.uuid4().hex[:10].upper()}",
-                "cancelled_by": random.choice(["customer", "system", "admin"]),
-                "cancellation_reason": random.choice([
-                    "changed_mind", "found_better_price", "delivery_too_slow",
-                    "payment_issue", "out_of_stock", "duplicate_order"
-                ]),
-                "order_value_vnd": random.randint(500000, 50000000),
+                "order_id": f"ORD_{order_hex[i * 10:i * 10 + 10]}",
+                "cancelled_by": cancelled_by[i],
+                "cancellation_reason": cancellation_reasons[i],
+                "order_value_vnd": order_amounts[i],
             })
 
-        events.append(event)
+        append_event(event)
 
-    # Sort by timestamp
-    events.sort(key=lambda x: x["timestamp"])
     return events
 
-def generate_all_events(count=10000, mode="replace"):
-    """Generate all cart events with batch processing and progress tracking"""
-    import time
+def _generate_events_shard(count, products):
+    """Worker process entry point: generate one shard of cart events"""
+    # Each batch seeds its own NumPy generator from OS entropy, so forked
+    # workers do not repeat each other's draws
+    return generate_cart_events_batch(count, products)
 
+def generate_all_events(count=10000, mode="replace"):
+    """Generate all cart events in sharded worker processes with progress tracking"""
     print(f"Starting cart event generation: {count:,} events (mode: {mode})")
 
     # Initialize generation status
-    generation_status["cart_events"]["target"] = count
-    generation_status["cart_events"]["generated"] = 0
-    generation_status["cart_events"]["completed"] = False
-    generation_status["start_time"] = datetime.now()
-    generation_status["progress_percentage"] = 0
+    start_time = datetime.now()
+    generation_status.update({
+        "cart_events": {"generated": 0, "target": count, "completed": False},
+        "start_time": start_time,
+        "progress_percentage": 0
+    })
 
     batch_file = TRACKING_DIR / "cart_events.json.gz"
 
     # Load existing events if appending
-    all_events = []
+    existing = []
     if mode == "append":
-        existing = load_compressed(batch_file)
+        existing = load_compressed(batch_file) or []
         if existing:
-            all_events = existing
             print(f"Appending to {len(existing):,} existing events")
 
-    # Generate in batches of 50,000 to avoid memory issues and allow progress tracking
-    batch_size = 50000
-    num_batches = (count + batch_size - 1) // batch_size
-
-    for batch_num in range(num_batches):
-        batch_start = time.time()
-        current_batch_size = min(batch_size, count - len(all_events) + (len(existing) if mode == "append" and existing else 0))
+    # Products are passed to the workers explicitly rather than relying on
+    # module state being loaded in the child process
+    products = data_generator.SHARED_PRODUCTS
+    shard_sizes = [min(GENERATION_SHARD_SIZE, count - start) for start in range(0, count, GENERATION_SHARD_SIZE)]
+    num_shards = len(shard_sizes)
 
-        if current_batch_size <= 0:
-            break
+    if num_shards == 1:
+        # Not worth the pickling round trip to a worker process
+        shard_results = iter([generate_cart_events_batch(count, products)])
+    else:
+        futures = [_gen_pool.submit(_generate_events_shard, size, products) for size in shard_sizes]
+        shard_results = (future.result() for future in as_completed(futures))
 
-        print(f"Generating batch {batch_num + 1}/{num_batches} ({current_batch_size:,} events)...")
+    print(f"Generating {num_shards} shard(s) of up to {GENERATION_SHARD_SIZE:,} events...")
 
-        # Generate batch
-        new_events = generate_cart_events_batch(current_batch_size)
-        all_events.extend(new_events)
+    shards = []
+    generated = 0
+    for shard_num, new_events in enumerate(shard_results, 1):
+        shards.append(new_events)
 
         # Update progress
-        if mode == "append" and existing:
-            generation_status["cart_events"]["generated"] = len(all_events) - len(existing)
-        else:
-            generation_status["cart_events"]["generated"] = len(all_events)
-
-        generation_status["progress_percentage"] = round(
-            (generation_status["cart_events"]["generated"] / count) * 100, 2
-        )
+        generated += len(new_events)
+        progress_percentage = round((generated / count) * 100, 2)
 
         # Calculate ETA
-        elapsed_time = (datetime.now() - generation_status["start_time"]).total_seconds()
-        if generation_status["cart_events"]["generated"] > 0:
-            avg_time_per_event = elapsed_time / generation_status["cart_events"]["generated"]
-            remaining_events = count - generation_status["cart_events"]["generated"]
+        elapsed_time = (datetime.now() - start_time).total_seconds()
+        estimated_completion_time = generation_status["estimated_completion_time"]
+        if generated > 0:
+            avg_time_per_event = elapsed_time / generated
+            remaining_events = count - generated
             eta_seconds = avg_time_per_event * remaining_events
-            generation_status["estimated_completion_time"] = (
-                datetime.now() + timedelta(seconds=eta_seconds)
-            ).isoformat()
+            estimated_completion_time = (datetime.now() + timedelta(seconds=eta_seconds)).isoformat()
             eta_minutes = eta_seconds / 60
-            print(f"Progress: {generation_status['progress_percentage']}% - ETA: {eta_minutes:.1f} minutes")
+            print(f"Progress: {progress_percentage}% - ETA: {eta_minutes:.1f} minutes")
+
+        generation_status.update({
+            "cart_events": {"generated": generated, "target": count, "completed": False},
+            "progress_percentage": progress_percentage,
+            "estimated_completion_time": estimated_completion_time
+        })
 
-        batch_end = time.time()
-        print(f"Batch {batch_num + 1} completed in {batch_end - batch_start:.2f}s")
+        print(f"Shard {shard_num}/{num_shards} completed ({len(new_events):,} events)")
 
-    # Sort all events by timestamp
-    print("Sorting events by timestamp...")
-    all_events.sort(key=lambda x: x["timestamp"])
+    # Existing events and every shard are already sorted by timestamp, so a
+    # linear k-way merge replaces re-sorting the combined list
+    print("Merging events by timestamp...")
+    if any(existing[i]["timestamp"] > existing[i + 1]["timestamp"] for i in range(len(existing) - 1)):
+        existing.sort(key=itemgetter("timestamp"))
+    all_events = list(heapq.merge(existing, *shards, key=itemgetter("timestamp")))
 
     # Save to file
     print("Saving events to file...")
     save_compressed(all_events, batch_file)
+    _write_events_meta(batch_file, len(all_events))
+    _update_events_cache(all_events, batch_file.stat().st_mtime_ns)
 
     # Update final status
-    generation_status["cart_events"]["generated"] = len(all_events) if mode == "replace" else len(all_events) - (len(existing) if existing else 0)
-    generation_status["cart_events"]["target"] = count
-    generation_status["cart_events"]["completed"] = True
-    generation_status["progress_percentage"] = 100
-    generation_status["estimated_completion_time"] = None
+    generation_status.update({
+        "cart_events": {"generated": generated, "target": count, "completed": True},
+        "progress_percentage": 100,
+        "estimated_completion_time": None
+    })
 
-    total_time = (datetime.now() - generation_status["start_time"]).total_seconds()
+    total_time = (datetime.now() - start_time).total_seconds()
     print(f"Cart event generation completed! Total: {len(all_events):,} events in {total_time:.2f}s")
 
     return all_events
 
+def _value_counts(codes, names):
+    """Count occurrences per encoded value, in first-appearance order like a dict counter"""
+    values, first, counts = np.unique(codes, return_index=True, return_counts=True)
+    order = np.argsort(first)
+    return {names[code]: n for code, n in zip(values[order].tolist(), counts[order].tolist())}
+
+def _compute_cart_statistics(events, columns):
+    """Aggregate cart statistics over the cached event columns"""
+    event_type_counts = _value_counts(columns["event_type"], columns["event_type_names"])
+    source_counts = _value_counts(columns["source"], columns["source_names"])
+    device_counts = _value_counts(columns["device"], columns["device_names"])
+
+    # Top products added to cart
+    add_rows = np.flatnonzero((columns["event_type"] == EVENT_TYPE_CODES["add_to_cart"]) & (columns["product_id"] != 0))
+    pids, first, inverse, add_counts = np.unique(
+        columns["product_id"][add_rows], return_index=True, return_inverse=True, return_counts=True
+    )
+    total_values = np.bincount(inverse, weights=columns["line_total_vnd"][add_rows], minlength=len(pids))
+    # Highest count first, ties in first-appearance order
+    top = np.lexsort((first, -add_counts))[:10]
+    top_products = [
+        (pids[k].item(), {
+            "count": add_counts[k].item(),
+            "name": events[add_rows[first[k]]].get("product_name", ""),
+            "total_value_vnd": int(total_values[k])
+        })
+        for k in top
+    ]
+
+    # Unique customers and sessions
+    customer_ids = columns["customer_id"]
+    session_ids = columns["session_id"]
+    unique_customers = np.unique(customer_ids[customer_ids != 0]).size
+    unique_sessions = np.unique(session_ids[session_ids != ""]).size
+
+    # Calculate add/remove ratio
+    add_count = event_type_counts.get("add_to_cart", 0)
+    remove_count = event_type_counts.get("remove_from_cart", 0)
+
+    return {
+        "total_events": len(events),
+        "by_event_type": event_type_counts,
+        "by_source": source_counts,
+        "by_device": device_counts,
+        "unique_customers": unique_customers,
+        "unique_sessions": unique_sessions,
+        "add_remove_ratio": round(add_count / remove_count, 2) if remove_count > 0 else add_count,
+        "top_products_added": [
+            {"product_id": pid, "name": data["name"], "add_count": data["count"], "total_value_vnd": data["total_value_vnd"]}
+            for pid, data in top_products
+        ]
+    }
+
+def _parse_query_datetime(value):
+    """Parse an ISO query date once into datetime64, or None if it isn't ISO"""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return np.datetime64(parsed.replace(tzinfo=None), "us")
+
+def _compute_abandoned_carts(session_state, hours_threshold, limit):
+    """Pick abandoned carts from the precomputed session state, highest value first"""
+    now = np.datetime64(datetime.now(), "us")
+    threshold = now - np.timedelta64(hours_threshold, "h")
+
+    rows = np.flatnonzero(session_state["last_activity_dt"] < threshold)
+    # Stable sort keeps ties in session order
+    top = rows[np.argsort(-session_state["cart_value_vnd"][rows], kind="stable")[:limit]]
+    hours_since = ((now - session_state["last_activity_dt"][top]) / np.timedelta64(1, "h")).astype(np.int64)
+
+    result = [
+        {
+            "session_id": session_state["session_id"][k],
+            "customer_id": session_state["customer_id"][k],
+            "last_activity": session_state["last_activity"][k],
+            "hours_since_activity": hours,
+            "cart_items": session_state["cart_items"][k],
+            "cart_value_vnd": session_state["cart_value_vnd"][k].item(),
+            "item_count": len(session_state["cart_items"][k])
+        }
+        for k, hours in zip(top.tolist(), hours_since.tolist())
+    ]
+    return result, len(rows)
+
 # API Endpoints
 @router.get("/", response_model=StandardResponse)
 async def cart_tracking_info():
@@ -395,7 +886,7 @@ async def cart_tracking_info():
         }
     }
 
-@router.get("/events", response_model=StandardResponse)
+@router.get("/events")
 async def get_cart_events(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
@@ -406,316 +897,220 @@ async def get_cart_events(
     end_date: Optional[str] = Query(None, description="End date (ISO)")
 ):
     """Get cart tracking events with filters"""
-    batch_file = TRACKING_DIR / "cart_events.json.gz"
-    events = load_compressed(batch_file)
+    view = await get_events_view()
+    events = view["events"] if view else None
 
     if not events:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": "No events data. Generate via /cart/generate/events",
             "data": [],
             "count": 0
-        }
-
-    filtered = events
+        })
 
-    if event_type:
-        filtered = [e for e in filtered if e.get("event_type") == event_type]
-    if source:
-        filtered = [e for e in filtered if e.get("source") == source]
-    if device:
-        filtered = [e for e in filtered if e.get("device") == device]
+    # Cached events are sorted by timestamp ascending, so the date range is a
+    # binary search on the datetime64 column. Non-ISO bounds keep the plain
+    # string comparison on the raw timestamps.
+    ts = view["columns"]["timestamp"]
+    lo, hi = 0, len(events)
     if start_date:
-        filtered = [e for e in filtered if e.get("timestamp", "") >= start_date]
+        start = _parse_query_datetime(start_date)
+        lo = int(np.searchsorted(ts, start, side="left")) if start is not None else bisect_left(events, start_date, key=itemgetter("timestamp"))
     if end_date:
-        filtered = [e for e in filtered if e.get("timestamp", "") <= end_date]
-
-    # Sort by timestamp descending
-    filtered.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    result = filtered[offset:offset + limit]
-
-    return {
+        end = _parse_query_datetime(end_date)
+        hi = int(np.searchsorted(ts, end, side="right")) if end is not None else bisect_right(events, end_date, key=itemgetter("timestamp"))
+    hi = max(hi, lo)
+
+    if event_type or source or device:
+        # Evaluate the equality filters as one vectorized mask over the cached
+        # columns, restricted to the date range, and only touch matching rows
+        columns = view["columns"]
+        mask = np.ones(hi - lo, dtype=bool)
+        for field, value in (("event_type", event_type), ("source", source), ("device", device)):
+            if value:
+                mask &= columns[field][lo:hi] == _column_code(columns, field, value)
+        rows = np.flatnonzero(mask) + lo
+    else:
+        rows = np.arange(lo, hi)
+    total = len(rows)
+
+    # Newest first: take the page from the tail and reverse it
+    page_end = max(total - offset, 0)
+    result = [events[k] for k in rows[max(page_end - limit, 0):page_end][::-1].tolist()]
+
+    return _fast_response({
         "status": "success",
         "msg": "Events retrieved successfully",
         "data": result,
         "count": len(result),
-        "total": len(filtered)
-    }
+        "total": total
+    })
 
-@router.get("/events/customer/{customer_id}", response_model=StandardResponse)
+@router.get("/events/customer/{customer_id}")
 async def get_customer_cart_events(
     customer_id: int = Path(..., ge=1),
     limit: int = Query(100, ge=1, le=500)
 ):
     """Get cart events for a specific customer"""
-    batch_file = TRACKING_DIR / "cart_events.json.gz"
-    events = load_compressed(batch_file)
+    view = await get_events_view()
+    events = view["events"] if view else None
 
     if not events:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": "No events data",
             "data": [],
             "count": 0
-        }
+        })
 
-    filtered = [e for e in events if e.get("customer_id") == customer_id]
-    filtered.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    result = filtered[:limit]
+    rows = _index_rows(view["indexes"]["by_customer"], customer_id)
+    result = [events[k] for k in rows[-limit:][::-1].tolist()]
 
-    return {
+    return _fast_response({
         "status": "success",
         "msg": f"Events for customer {customer_id}",
         "data": result,
         "count": len(result),
-        "total": len(filtered)
-    }
+        "total": len(rows)
+    })
 
-@router.get("/events/product/{product_id}", response_model=StandardResponse)
+@router.get("/events/product/{product_id}")
 async def get_product_cart_events(
     product_id: int = Path(..., ge=1),
     limit: int = Query(100, ge=1, le=500)
 ):
     """Get cart events for a specific product"""
-    batch_file = TRACKING_DIR / "cart_events.json.gz"
-    events = load_compressed(batch_file)
+    view = await get_events_view()
+    events = view["events"] if view else None
 
     if not events:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": "No events data",
             "data": [],
             "count": 0
-        }
+        })
 
-    filtered = [e for e in events if e.get("product_id") == product_id]
-    filtered.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    result = filtered[:limit]
+    rows = _index_rows(view["indexes"]["by_product"], product_id)
+    result = [events[k] for k in rows[-limit:][::-1].tolist()]
 
-    return {
+    return _fast_response({
         "status": "success",
         "msg": f"Events for product {product_id}",
         "data": result,
         "count": len(result),
-        "total": len(filtered)
-    }
+        "total": len(rows)
+    })
 
-@router.get("/events/session/{session_id}", response_model=StandardResponse)
+@router.get("/events/session/{session_id}")
 async def get_session_cart_events(
     session_id: str = Path(...),
     limit: int = Query(100, ge=1, le=500)
 ):
     """Get cart events for a specific session"""
-    batch_file = TRACKING_DIR / "cart_events.json.gz"
-    events = load_compressed(batch_file)
+    view = await get_events_view()
+    events = view["events"] if view else None
 
     if not events:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": "No events data",
             "data": [],
             "count": 0
-        }
+        })
 
-    filtered = [e for e in events if e.get("session_id") == session_id]
-    filtered.sort(key=lambda x: x.get("timestamp", ""))
-    result = filtered[:limit]
+    rows = _index_rows(view["indexes"]["by_session"], session_id)
+    result = [events[k] for k in rows[:limit].tolist()]
 
-    return {
+    return _fast_response({
         "status": "success",
         "msg": f"Events for session {session_id}",
         "data": result,
         "count": len(result)
-    }
+    })
 
-@router.get("/statistics", response_model=StandardResponse)
+@router.get("/statistics")
 async def get_cart_statistics():
     """Get cart tracking statistics"""
 
     # Check if generation is in progress
-    if generation_status["is_generating"]:
-        elapsed = (datetime.now() - generation_status["start_time"]).total_seconds() / 60 if generation_status["start_time"] else 0
+    snapshot = generation_status.copy()
+    if snapshot["is_generating"]:
+        elapsed = (datetime.now() - snapshot["start_time"]).total_seconds() / 60 if snapshot["start_time"] else 0
         eta_str = "calculating..."
 
-        if generation_status["estimated_completion_time"]:
+        if snapshot["estimated_completion_time"]:
             try:
-                eta_time = datetime.fromisoformat(generation_status["estimated_completion_time"])
+                eta_time = datetime.fromisoformat(snapshot["estimated_completion_time"])
                 remaining_minutes = (eta_time - datetime.now()).total_seconds() / 60
                 eta_str = f"{remaining_minutes:.1f} minutes"
             except:
                 pass
 
-        return {
+        return _fast_response({
             "status": "warning",
             "msg": f"Event generation in progress. Statistics will be available after completion. Please try again in approximately {eta_str}.",
             "data": {
                 "generation_status": "in_progress",
-                "progress": f"{generation_status['progress_percentage']}%",
-                "events_generated": generation_status["cart_events"]["generated"],
-                "target_events": generation_status["cart_events"]["target"],
+                "progress": f"{snapshot['progress_percentage']}%",
+                "events_generated": snapshot["cart_events"]["generated"],
+                "target_events": snapshot["cart_events"]["target"],
                 "elapsed_time_minutes": round(elapsed, 2),
                 "estimated_completion": eta_str,
                 "message": "Final statistics cannot be calculated until generation is complete. Please check back later."
             }
-        }
+        })
 
-    batch_file = TRACKING_DIR / "cart_events.json.gz"
-    events = load_compressed(batch_file)
+    view = await get_events_view()
+    events = view["events"] if view else None
 
     if not events:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": "No events data. Please generate events first using /cart/generate/events",
             "data": None
-        }
+        })
 
-    # Count by event type
-    event_type_counts = {}
-    for e in events:
-        et = e.get("event_type", "unknown")
-        event_type_counts[et] = event_type_counts.get(et, 0) + 1
+    # Statistics only change when the events do, so compute them once per view
+    data = view.get("statistics")
+    if data is None:
+        data = await asyncio.to_thread(_compute_cart_statistics, events, view["columns"])
+        view["statistics"] = data
 
-    # Count by source
-    source_counts = {}
-    for e in events:
-        src = e.get("source", "unknown")
-        source_counts[src] = source_counts.get(src, 0) + 1
-
-    # Count by device
-    device_counts = {}
-    for e in events:
-        dev = e.get("device", "unknown")
-        device_counts[dev] = device_counts.get(dev, 0) + 1
-
-    # Top products added to cart
-    add_events = [e for e in events if e.get("event_type") == "add_to_cart"]
-    product_adds = {}
-    for e in add_events:
-        pid = e.get("product_id")
-        if pid:
-            if pid not in product_adds:
-                product_adds[pid] = {"count": 0, "name": e.get("product_name", ""), "total_value_vnd": 0}
-            product_adds[pid]["count"] += 1
-            product_adds[pid]["total_value_vnd"] += e.get("line_total_vnd", 0)
-
-    top_products = sorted(product_adds.items(), key=lambda x: x[1]["count"], reverse=True)[:10]
-
-    # Unique customers and sessions
-    unique_customers = len(set(e.get("customer_id") for e in events if e.get("customer_id")))
-    unique_sessions = len(set(e.get("session_id") for e in events if e.get("session_id")))
-
-    # Calculate add/remove ratio
-    add_count = event_type_counts.get("add_to_cart", 0)
-    remove_count = event_type_counts.get("remove_from_cart", 0)
-
-    return {
+    return _fast_response({
         "status": "success",
         "msg": "Statistics retrieved",
-        "data": {
-            "total_events": len(events),
-            "by_event_type": event_type_counts,
-            "by_source": source_counts,
-            "by_device": device_counts,
-            "unique_customers": unique_customers,
-            "unique_sessions": unique_sessions,
-            "add_remove_ratio": round(add_count / remove_count, 2) if remove_count > 0 else add_count,
-            "top_products_added": [
-                {"product_id": pid, "name": data["name"], "add_count": data["count"], "total_value_vnd": data["total_value_vnd"]}
-                for pid, data in top_products
-            ]
-        }
-    }
+        "data": data
+    })
 
-@router.get("/abandoned", response_model=StandardResponse)
+@router.get("/abandoned")
 async def get_abandoned_carts(
     limit: int = Query(50, ge=1, le=200),
     hours_threshold: int = Query(24, ge=1, le=168, description="Hours since last activity to consider abandoned")
 ):
     """Get abandoned cart sessions (added items but didn't purchase)"""
-    batch_file = TRACKING_DIR / "cart_events.json.gz"
-    events = load_compressed(batch_file)
+    view = await get_events_view()
+    events = view["events"] if view else None
 
     if not events:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": "No events data",
             "data": [],
             "count": 0
-        }
-
-    # Group events by session
-    sessions = {}
-    for e in events:
-        sid = e.get("session_id")
-        if sid:
-            if sid not in sessions:
-                sessions[sid] = {
-                    "session_id": sid,
-                    "customer_id": e.get("customer_id"),
-                    "events": [],
-                    "cart_items": {},
-                    "last_activity": ""
-                }
-            sessions[sid]["events"].append(e)
-            if e.get("timestamp", "") > sessions[sid]["last_activity"]:
-                sessions[sid]["last_activity"] = e["timestamp"]
-
-    # Calculate current cart state for each session
-    threshold = datetime.now() - timedelta(hours=hours_threshold)
-    abandoned = []
-
-    for sid, session in sessions.items():
-        # Calculate cart items
-        cart = {}
-        for e in session["events"]:
-            pid = e.get("product_id")
-            if not pid:
-                continue
-
-            if e.get("event_type") == "add_to_cart":
-                if pid not in cart:
-                    cart[pid] = {"product": e.get("product_name"), "quantity": 0, "price": e.get("product_price_vnd", 0)}
-                cart[pid]["quantity"] += e.get("quantity", 1)
-            elif e.get("event_type") == "remove_from_cart":
-                if pid in cart:
-                    cart[pid]["quantity"] -= e.get("quantity", 1)
-                    if cart[pid]["quantity"] <= 0:
-                        del cart[pid]
-            elif e.get("event_type") == "update_quantity":
-                if pid in cart:
-                    cart[pid]["quantity"] = e.get("quantity", 0)
-                    if cart[pid]["quantity"] <= 0:
-                        del cart[pid]
+        })
 
-        # Check if abandoned (has items and last activity older than threshold)
-        if cart and session["last_activity"]:
-            try:
-                last_time = datetime.fromisoformat(session["last_activity"].replace("Z", "+00:00").replace("+00:00", ""))
-                if last_time < threshold:
-                    total_value = sum(item["price"] * item["quantity"] for item in cart.values())
-                    abandoned.append({
-                        "session_id": sid,
-                        "customer_id": session["customer_id"],
-                        "last_activity": session["last_activity"],
-                        "hours_since_activity": int((datetime.now() - last_time).total_seconds() / 3600),
-                        "cart_items": list(cart.values()),
-                        "cart_value_vnd": total_value,
-                        "item_count": len(cart)
-                    })
-            except:
-                pass
+    result, total = await asyncio.to_thread(
+        _compute_abandoned_carts, view["session_state"], hours_threshold, limit
+    )
 
-    # Sort by cart value descending
-    abandoned.sort(key=lambda x: x.get("cart_value_vnd", 0), reverse=True)
-    result = abandoned[:limit]
-
-    return {
+    return _fast_response({
         "status": "success",
         "msg": f"Abandoned carts (inactive > {hours_threshold}h)",
         "data": result,
         "count": len(result),
-        "total": len(abandoned)
-    }
+        "total": total
+    })
 
 # Generation Endpoints
 @router.post("/generate/events", response_model=StandardResponse)
@@ -740,27 +1135,30 @@ async def generate_events_endpoint(
         # Ensure products are loaded
         await ensure_products_loaded()
 
-        batch_file = TRACKING_DIR / "cart_events.json.gz"
-        existing = load_compressed(batch_file)
+        existing_count = await get_event_count()
 
-        if existing and method != "new":
+        if existing_count and method != "new":
             return {
                 "status": "warning",
-                "msg": f"Events already exist ({len(existing):,} events). Use 'method=new' to append or call without method parameter to replace.",
+                "msg": f"Events already exist ({existing_count:,} events). Use 'method=new' to append or call without method parameter to replace.",
                 "data": {
-                    "existing_events": len(existing),
+                    "existing_events": existing_count,
                     "action_required": "Add '?method=new' to append, or call again to replace existing data"
                 },
-                "count": len(existing)
+                "count": existing_count
             }
 
-        if generation_status["is_generating"]:
-            elapsed = (datetime.now() - generation_status["start_time"]).total_seconds() / 60 if generation_status["start_time"] else 0
+        # Checking and taking the lock happen in one step, so two concurrent
+        # requests can no longer both start a generation
+        lock_file = _acquire_generation_lock()
+        if lock_file is None:
+            snapshot = generation_status.copy()
+            elapsed = (datetime.now() - snapshot["start_time"]).total_seconds() / 60 if snapshot["start_time"] else 0
             eta_str = "calculating..."
 
-            if generation_status["estimated_completion_time"]:
+            if snapshot["estimated_completion_time"]:
                 try:
-                    eta_time = datetime.fromisoformat(generation_status["estimated_completion_time"])
+                    eta_time = datetime.fromisoformat(snapshot["estimated_completion_time"])
                     remaining_minutes = (eta_time - datetime.now()).total_seconds() / 60
                     eta_str = f"{remaining_minutes:.1f} minutes"
                 except:
@@ -770,21 +1168,25 @@ async def generate_events_endpoint(
                 "status": "warning",
                 "msg": f"Event generation already in progress. Please wait for completion (ETA: {eta_str})",
                 "data": {
-                    "progress": f"{generation_status['progress_percentage']}%",
-                    "events_generated": generation_status["cart_events"]["generated"],
-                    "target_events": generation_status["cart_events"]["target"],
+                    "progress": f"{snapshot['progress_percentage']}%",
+                    "events_generated": snapshot["cart_events"]["generated"],
+                    "target_events": snapshot["cart_events"]["target"],
                     "elapsed_time_minutes": round(elapsed, 2),
                     "estimated_completion": eta_str
                 }
             }
 
+        job_id = secrets.token_hex(8)
+        generation_status["job_id"] = job_id
+        generation_status["is_generating"] = True
+
         def generate():
-            generation_status["is_generating"] = True
             try:
                 mode = "append" if method == "new" else "replace"
                 generate_all_events(count, mode)
             finally:
                 generation_status["is_generating"] = False
+                _release_generation_lock(lock_file)
 
         background_tasks.add_task(generate)
 
@@ -796,6 +1198,7 @@ async def generate_events_endpoint(
             "status": "success",
             "msg": f"Event generation started. Generating {count:,} events ({estimated_time_msg}). Check /cart/generate/status for progress.",
             "data": {
+                "job_id": job_id,
                 "target_events": count,
                 "mode": "append" if method == "new" else "replace",
                 "estimated_duration": estimated_time_msg,
@@ -813,16 +1216,20 @@ async def generate_events_endpoint(
 @router.get("/generate/status", response_model=StandardResponse)
 async def get_generation_status():
     """Get detailed generation status with progress and ETA"""
+    # One copy per request: every field below comes from the same update
+    snapshot = generation_status.copy()
+    events = snapshot["cart_events"]
 
-    if not generation_status["is_generating"]:
-        if generation_status["cart_events"]["completed"]:
+    if not snapshot["is_generating"]:
+        if events["completed"]:
             return {
                 "status": "success",
                 "msg": "No active generation. Last generation completed successfully.",
                 "data": {
                     "generation_status": "completed",
-                    "total_events": generation_status["cart_events"]["generated"],
-                    "last_target": generation_status["cart_events"]["target"],
+                    "job_id": snapshot["job_id"],
+                    "total_events": events["generated"],
+                    "last_target": events["target"],
                     "is_generating": False
                 }
             }
@@ -838,36 +1245,37 @@ async def get_generation_status():
             }
 
     # Generation in progress
-    elapsed = (datetime.now() - generation_status["start_time"]).total_seconds() if generation_status["start_time"] else 0
+    elapsed = (datetime.now() - snapshot["start_time"]).total_seconds() if snapshot["start_time"] else 0
     elapsed_minutes = elapsed / 60
 
     eta_str = "calculating..."
     eta_minutes = None
 
-    if generation_status["estimated_completion_time"]:
+    if snapshot["estimated_completion_time"]:
         try:
-            eta_time = datetime.fromisoformat(generation_status["estimated_completion_time"])
+            eta_time = datetime.fromisoformat(snapshot["estimated_completion_time"])
             remaining_seconds = (eta_time - datetime.now()).total_seconds()
             eta_minutes = remaining_seconds / 60
             eta_str = f"{eta_minutes:.1f} minutes" if eta_minutes > 1 else f"{remaining_seconds:.0f} seconds"
         except:
             pass
 
-    events_per_second = generation_status["cart_events"]["generated"] / elapsed if elapsed > 0 else 0
+    events_per_second = events["generated"] / elapsed if elapsed > 0 else 0
 
     return {
         "status": "success",
-        "msg": f"Event generation in progress: {generation_status['progress_percentage']}% complete",
+        "msg": f"Event generation in progress: {snapshot['progress_percentage']}% complete",
         "data": {
             "generation_status": "in_progress",
+            "job_id": snapshot["job_id"],
             "is_generating": True,
-            "progress_percentage": generation_status["progress_percentage"],
-            "events_generated": generation_status["cart_events"]["generated"],
-            "target_events": generation_status["cart_events"]["target"],
-            "remaining_events": generation_status["cart_events"]["target"] - generation_status["cart_events"]["generated"],
+            "progress_percentage": snapshot["progress_percentage"],
+            "events_generated": events["generated"],
+            "target_events": events["target"],
+            "remaining_events": events["target"] - events["generated"],
             "elapsed_time_seconds": round(elapsed, 2),
             "elapsed_time_minutes": round(elapsed_minutes, 2),
-            "estimated_completion_time": generation_status["estimated_completion_time"],
+            "estimated_completion_time": snapshot["estimated_completion_time"],
             "estimated_time_remaining": eta_str,
             "events_per_second": round(events_per_second, 2),
             "message": f"Generation in progress. Estimated completion in {eta_str}. Statistics will be available after completion."
@@ -4,12 +4,16 @@ APIs for looking up transaction, customer, employee, and product details
 """
 
 from fastapi import APIRouter, Query, Path
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Any, List
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path as FilePath
+import asyncio
 import gzip
-import json
+import numpy as np
+import orjson
 import shared.data_generator as data_generator
 # from shared.data_generator import (
 #     DATA_DIR, PRIVATE_DIRS, get_share_data_path, get_private_data_path,
@@ -18,7 +22,8 @@ import shared.data_generator as data_generator
 #     ensure_products_loaded, ensure_staff_loaded, ensure_locations_loaded, ensure_shops_loaded
 # )
 
-router = APIRouter()
+# orjson encodes the large record lists several times faster than stdlib json
+router = APIRouter(default_response_class=ORJSONResponse)
 
 # Standard Response Model
 class StandardResponse(BaseModel):
@@ -29,106 +34,267 @@ class StandardResponse(BaseModel):
     total: Optional[int] = Field(None)
 
 # Helper functions
+def _fast_response(content):
+    """Encode a StandardResponse-shaped dict with orjson directly, skipping Pydantic validation"""
+    return ORJSONResponse({
+        "status": content["status"],
+        "msg": content["msg"],
+        "data": content.get("data"),
+        "count": content.get("count"),
+        "total": content.get("total")
+    })
+
+def _read_compressed(filepath):
+    """Decompress and parse a file without caching it"""
+    # One-shot decompression of the whole file, parsed from bytes by orjson
+    with open(filepath, 'rb') as f:
+        return orjson.loads(gzip.decompress(f.read()))
+
+@lru_cache(maxsize=64)
+def _load_compressed_cached(path_str, mtime_ns, size):
+    """Decompress and parse a file; keyed on mtime/size so rewrites miss the cache"""
+    return _read_compressed(path_str)
+
 def load_compressed(filepath):
-    if not filepath.exists():
+    """Load compressed JSON, reusing the parsed data while the file is unchanged"""
+    try:
+        stat = filepath.stat()
+    except FileNotFoundError:
         return None
-    with gzip.open(filepath, 'rt', encoding='utf-8') as f:
-        return json.load(f)
+    # Callers only read the returned list, so the cached object can be shared
+    return _load_compressed_cached(str(filepath), stat.st_mtime_ns, stat.st_size)
+
+# Transaction sources in lookup order: (source, fields a transaction id can be
+# stored under, storage layout). "transactions" sources keep a single
+# transactions.json.gz, "orders" sources write orders_batch_N.json.gz batches
+TXN_SOURCES = (
+    ("paypal", ("transaction_id",), "transactions"),
+    ("mercury", ("transaction_id",), "transactions"),
+    ("momo", ("transaction_id", "transId"), "transactions"),
+    ("zalopay", ("transaction_id", "apptransid"), "transactions"),
+    ("shopify", ("transaction_id",), "orders"),
+    ("sapo", ("transaction_id",), "orders"),
+    ("odoo", ("transaction_id",), "transactions")
+)
+
+# In-memory transaction index: source -> {transaction id: record}. Each source
+# is rebuilt only when its files (or their mtimes) change.
+_txn_index = {}
+_txn_index_mtimes = {}
+_txn_index_lock = asyncio.Lock()
+
+# Batch file listings: (directory, pattern) -> (directory mtime, files). Adding
+# or removing a batch changes the directory mtime; rewritten batches are
+# caught by the per-file mtimes of the transaction index.
+_batch_listings = {}
+
+def _list_batches(directory, pattern):
+    """Batch files in a directory in batch-number order, re-globbed only when the directory changes"""
+    try:
+        mtime = directory.stat().st_mtime_ns
+    except FileNotFoundError:
+        return []
+    cached = _batch_listings.get((directory, pattern))
+    if cached is None or cached[0] != mtime:
+        files = sorted(directory.glob(pattern), key=lambda f: (len(f.name), f.name))
+        cached = _batch_listings[(directory, pattern)] = (mtime, files)
+    return cached[1]
+
+# Resolved transaction file per source, kept once the private file exists so
+# lookups skip the existence probes; dropped again if the file goes away
+_source_paths = {}
+
+def _source_files(source, layout):
+    """Data files of a transaction source, in search order"""
+    if layout == "orders":
+        files = _list_batches(data_generator.get_private_data_path(source, ""), "orders_batch_*.json.gz")
+        if not files:
+            files = _list_batches(data_generator.DATA_DIR / f"{source}_orders", "*.json.gz")
+        return files
+
+    txn_file = _source_paths.get(source)
+    if txn_file is not None:
+        return [txn_file]
+
+    txn_file = data_generator.get_private_data_path(source, "transactions.json.gz")
+    if txn_file.exists():
+        # The private file always wins over the legacy one, so it can be kept
+        _source_paths[source] = txn_file
+        return [txn_file]
+    txn_file = data_generator.DATA_DIR / f"{source}_transactions" / "transactions.json.gz"
+    return [txn_file] if txn_file.exists() else []
+
+def _build_source_index(files, id_keys):
+    """Map every transaction id in the files to its first matching record"""
+    index = {}
+    for batch_file in files:
+        for record in load_compressed(batch_file) or []:
+            for key in id_keys:
+                txn_id = record.get(key)
+                if txn_id is not None and txn_id not in index:
+                    index[txn_id] = record
+    return index
+
+def _refresh_source_index(source, id_keys, layout):
+    """Rebuild one source's index if its files changed since the last build"""
+    files = _source_files(source, layout)
+    try:
+        mtimes = tuple((str(f), f.stat().st_mtime_ns) for f in files)
+    except FileNotFoundError:
+        _source_paths.pop(source, None)
+        files = _source_files(source, layout)
+        mtimes = tuple((str(f), f.stat().st_mtime_ns) for f in files)
+    if _txn_index_mtimes.get(source) != mtimes:
+        _txn_index[source] = _build_source_index(files, id_keys)
+        _txn_index_mtimes[source] = mtimes
+
+async def _refresh_txn_index():
+    """Refresh every source's index concurrently on the thread pool"""
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_refresh_source_index, source, id_keys, layout) for source, id_keys, layout in TXN_SOURCES),
+        return_exceptions=True
+    )
+    # A source that fails to load keeps its previous index (or none) so the
+    # others can still answer
+    for (source, _, _), result in zip(TXN_SOURCES, results):
+        if isinstance(result, Exception):
+            print(f"Failed to index {source} transactions: {result}")
 
 def search_transactions_across_sources(transaction_id: str):
-    """Search for a transaction across all data sources"""
+    """Search for a transaction across all data sources using the in-memory index"""
     results = []
+    for source, _, _ in TXN_SOURCES:
+        record = _txn_index.get(source, {}).get(transaction_id)
+        if record is not None:
+            results.append({"source": source, "data": record})
+    return results
 
-    # Search PayPal transactions
-    paypal_file = data_generator.get_private_data("paypal", "transactions.json.gz")
-    if not paypal_file.exists():
-        paypal_file = data_generator.DATA_DIR / "paypal_transactions" / "transactions.json.gz"
-    if paypal_file.exists():
-        transactions = load_compressed(paypal_file)
-        if transactions:
-            for t in transactions:
-                if t.get("transaction_id") == transaction_id:
-                    results.append({"source": "paypal", "data": t})
-                    break
-
-    # Search Mercury transactions
-    mercury_file = data_generator.get_private_data("mercury", "transactions.json.gz")
-    if not mercury_file.exists():
-        mercury_file = data_generator.DATA_DIR / "mercury_transactions" / "transactions.json.gz"
-    if mercury_file.exists():
-        transactions = load_compressed(mercury_file)
-        if transactions:
-            for t in transactions:
-                if t.get("transaction_id") == transaction_id:
-                    results.append({"source": "mercury", "data": t})
-                    break
-
-    # Search MoMo transactions
-    momo_file = data_generator.get_private_data("momo", "transactions.json.gz")
-    if momo_file.exists():
-        transactions = load_compressed(momo_file)
-        if transactions:
-            for t in transactions:
-                if t.get("transaction_id") == transaction_id or t.get("transId") == transaction_id:
-                    results.append({"source": "momo", "data": t})
-                    break
-
-    # Search ZaloPay transactions
-    zalopay_file = data_generator.get_private_data("zalopay", "transactions.json.gz")
-    if zalopay_file.exists():
-        transactions = load_compressed(zalopay_file)
-        if transactions:
-            for t in transactions:
-                if t.get("transaction_id") == transaction_id or t.get("apptransid") == transaction_id:
-                    results.append({"source": "zalopay", "data": t})
-                    break
-
-    # Search Shopify orders
-    shopify_dir = data_generator.get_private_data("shopify", "orders")
-    if not shopify_dir.exists():
-        shopify_dir = data_generator.DATA_DIR / "shopify_orders"
-    if shopify_dir.exists():
-        for batch_file in FilePath(shopify_dir).glob("*.json.gz"):
-            orders = load_compressed(batch_file)
-            if orders:
-                for o in orders:
-                    if o.get("transaction_id") == transaction_id:
-                        results.append({"source": "shopify", "data": o})
-                        break
-            if any(r["source"] == "shopify" for r in results):
-                break
-
-    # Search Sapo orders
-    sapo_dir = data_generator.get_private_data("sapo", "orders")
-    if not sapo_dir.exists():
-        sapo_dir = data_generator.DATA_DIR / "sapo_orders"
-    if sapo_dir.exists():
-        for batch_file in FilePath(sapo_dir).glob("*.json.gz"):
-            orders = load_compressed(batch_file)
-            if orders:
-                for o in orders:
-                    if o.get("transaction_id") == transaction_id:
-                        results.append({"source": "sapo", "data": o})
-                        break
-            if any(r["source"] == "sapo" for r in results):
-                break
-
-    # Search Odoo orders
-    odoo_dir = data_generator.get_private_data("odoo", "orders")
-    if not odoo_dir.exists():
-        odoo_dir = data_generator.DATA_DIR / "odoo_orders"
-    if odoo_dir.exists():
-        for batch_file in FilePath(odoo_dir).glob("*.json.gz"):
-            orders = load_compressed(batch_file)
-            if orders:
-                for o in orders:
-                    if o.get("transaction_id") == transaction_id:
-                        results.append({"source": "odoo", "data": o})
-                        break
-            if any(r["source"] == "odoo" for r in results):
-                break
+# Filter indexes over the shared lists (value -> row ids, or columnar arrays),
+# rebuilt whenever data_generator replaces the list object
+_filter_indexes = {}
+
+def _group_rows(records, field, normalize):
+    """Map each normalized field value to the ids of the rows that have it"""
+    groups = {}
+    for i, record in enumerate(records):
+        groups.setdefault(normalize(record.get(field, "")), []).append(i)
+    return groups
+
+def _encode_field(records, field):
+    """Lowercased field values as int codes per record, plus the value -> code map"""
+    codes = {}
+    column = np.fromiter(
+        (codes.setdefault(r.get(field, "").lower(), len(codes)) for r in records),
+        dtype=np.int64, count=len(records)
+    )
+    return column, codes
+
+def _build_product_index(products):
+    """Columnar category/brand codes and prices for the product filters"""
+    category, category_codes = _encode_field(products, "category")
+    brand, brand_codes = _encode_field(products, "brand")
+    return {
+        "category": category,
+        "category_codes": category_codes,
+        "brand": brand,
+        "brand_codes": brand_codes,
+        "price_vnd": np.fromiter((p.get("price_vnd", 0) for p in products), dtype=np.int64, count=len(products))
+    }
 
-    return results
+def _get_filter_index(name, records, build):
+    """Return the cached index for a shared list, rebuilding it if the list changed"""
+    cached = _filter_indexes.get(name)
+    if cached is None or cached[0] is not records:
+        cached = _filter_indexes[name] = (records, build(records))
+    return cached[1]
+
+def _id_map(records):
+    """Map each id to its first record, matching the old first-hit scans"""
+    by_id = {}
+    for record in records:
+        by_id.setdefault(record.get("id"), record)
+    return by_id
+
+def _lowered_field(name, records, field):
+    """Lowercased values of one field for every record, cached like the indexes"""
+    return _get_filter_index(name, records, lambda rows: [r.get(field, "").lower() for r in rows])
+
+def _rows_containing(rows, values, needle):
+    """Row ids whose lowercased value contains the needle (case-insensitive)"""
+    needle = needle.lower()
+    return [i for i in rows if needle in values[i]]
+
+# Customers are stored in fixed-size batches; a customer's global row is
+# batch_num * CUSTOMER_BATCH_SIZE + its position in the batch
+CUSTOMER_BATCH_SIZE = 10_000
+
+# City/country -> global rows across every batch, built on the first filtered
+# request and rebuilt when the batch files change
+_customer_index = {"mtimes": None, "city": {}, "country": {}}
+_customer_index_lock = asyncio.Lock()
+
+def _customer_batch_files():
+    """Contiguous customer batch files from batch 0, new location first"""
+    customer_dir = FilePath(data_generator.get_share_data_path("customers"))
+    legacy_dir = data_generator.DATA_DIR / "customers"
+    names = {f.name for f in _list_batches(customer_dir, "customers_batch_*.json.gz")}
+    legacy_names = {f.name for f in _list_batches(legacy_dir, "customers_batch_*.json.gz")}
+
+    files = []
+    while True:
+        name = f"customers_batch_{len(files)}.json.gz"
+        if name in names:
+            files.append(customer_dir / name)
+        elif name in legacy_names:
+            files.append(legacy_dir / name)
+        else:
+            return files
+
+@lru_cache(maxsize=64)
+def _customer_id_map_cached(path_str, mtime_ns, size):
+    """Id -> customer map of one batch file, keyed like the file cache"""
+    return _id_map(_load_compressed_cached(path_str, mtime_ns, size) or [])
+
+def _get_customer(customer_id):
+    """Look up a customer through the per-batch id map"""
+    batch_num = (customer_id - 1) // CUSTOMER_BATCH_SIZE
+    batch_files = _customer_batch_files()
+    if batch_num >= len(batch_files):
+        return None
+    try:
+        stat = batch_files[batch_num].stat()
+    except FileNotFoundError:
+        return None
+    return _customer_id_map_cached(str(batch_files[batch_num]), stat.st_mtime_ns, stat.st_size).get(customer_id)
+
+def _build_customer_index(batch_files):
+    """Group global customer rows by lowercased city and country"""
+    city_rows, country_rows = {}, {}
+    for batch_num, batch_file in enumerate(batch_files):
+        base = batch_num * CUSTOMER_BATCH_SIZE
+        # Read without the file cache so indexing doesn't evict the hot batches
+        for i, customer in enumerate(_read_compressed(batch_file) or []):
+            city_rows.setdefault(customer.get("city", "").lower(), []).append(base + i)
+            country_rows.setdefault(customer.get("country", "").lower(), []).append(base + i)
+    return (
+        {value: np.array(rows, dtype=np.int64) for value, rows in city_rows.items()},
+        {value: np.array(rows, dtype=np.int64) for value, rows in country_rows.items()}
+    )
+
+async def _get_customer_index(batch_files):
+    """Return the customer index, rebuilding it in a worker thread if any batch changed"""
+    mtimes = tuple((str(f), f.stat().st_mtime_ns) for f in batch_files)
+    async with _customer_index_lock:
+        if _customer_index["mtimes"] != mtimes:
+            city, country = await asyncio.to_thread(_build_customer_index, batch_files)
+            _customer_index.update(mtimes=mtimes, city=city, country=country)
+    return _customer_index
+
+def _customer_rows_containing(value_rows, needle):
+    """Sorted global rows whose value contains the needle (case-insensitive)"""
+    needle = needle.lower()
+    matches = [rows for value, rows in value_rows.items() if needle in value]
+    return np.sort(np.concatenate(matches)) if matches else np.array([], dtype=np.int64)
 
 # API Endpoints
 @router.get("/", response_model=StandardResponse)
@@ -151,7 +317,24 @@ async def lookup_info():
         }
     }
 
-@router.get("/transaction/{transaction_id}", response_model=StandardResponse)
+@router.post("/cache/clear", response_model=StandardResponse)
+async def clear_lookup_cache():
+    """Drop cached file contents, batch listings and the transaction index"""
+    async with _txn_index_lock:
+        _load_compressed_cached.cache_clear()
+        _customer_id_map_cached.cache_clear()
+        _txn_index.clear()
+        _txn_index_mtimes.clear()
+        _batch_listings.clear()
+        _source_paths.clear()
+
+    return {
+        "status": "success",
+        "msg": "Lookup cache cleared",
+        "data": None
+    }
+
+@router.get("/transaction/{transaction_id}")
 async def check_transaction(
     transaction_id: str = Path(..., description="Transaction ID to look up (e.g., TXN20241124XXXXXXXX)")
 ):
@@ -167,17 +350,21 @@ async def check_transaction(
     - Sapo orders
     - Odoo orders
     """
+    # Refresh outside the event loop; the lock keeps concurrent lookups from
+    # rebuilding the same source twice
+    async with _txn_index_lock:
+        await _refresh_txn_index()
     results = search_transactions_across_sources(transaction_id)
 
     if not results:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": f"Transaction {transaction_id} not found in any source",
             "data": None,
             "count": 0
-        }
+        })
 
-    return {
+    return _fast_response({
         "status": "success",
         "msg": f"Transaction found in {len(results)} source(s)",
         "data": {
@@ -186,9 +373,9 @@ async def check_transaction(
             "details": results
         },
         "count": len(results)
-    }
+    })
 
-@router.get("/customer/{customer_id}", response_model=StandardResponse)
+@router.get("/customer/{customer_id}")
 async def get_customer_details(
     customer_id: int = Path(..., ge=1, description="Customer ID to look up")
 ):
@@ -201,22 +388,22 @@ async def get_customer_details(
     - Location
     - Order statistics
     """
-    customer = data_generator.get_customer_by_id(customer_id)
+    customer = _get_customer(customer_id)
 
     if not customer:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": f"Customer with ID {customer_id} not found",
             "data": None
-        }
+        })
 
-    return {
+    return _fast_response({
         "status": "success",
         "msg": "Customer details retrieved successfully",
         "data": customer
-    }
+    })
 
-@router.get("/employee/{employee_id}", response_model=StandardResponse)
+@router.get("/employee/{employee_id}")
 async def get_employee_details(
     employee_id: int = Path(..., ge=1, description="Employee/Staff ID to look up")
 ):
@@ -229,22 +416,23 @@ async def get_employee_details(
     - Contact details
     - Employment status
     """
-    employee = data_generator.get_staff_by_id(employee_id)
+    data_generator.ensure_staff_loaded()
+    employee = _get_filter_index("staff_by_id", data_generator.SHARED_STAFF, _id_map).get(employee_id)
 
     if not employee:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": f"Employee with ID {employee_id} not found",
             "data": None
-        }
+        })
 
-    return {
+    return _fast_response({
         "status": "success",
         "msg": "Employee details retrieved successfully",
         "data": employee
-    }
+    })
 
-@router.get("/product/{product_id}", response_model=StandardResponse)
+@router.get("/product/{product_id}")
 async def get_product_details(
     product_id: int = Path(..., ge=1, description="Product ID to look up")
 ):
@@ -257,22 +445,23 @@ async def get_product_details(
     - Category and brand
     - Stock information
     """
-    product = data_generator.get_product_by_id(product_id)
+    await data_generator.ensure_products_loaded()
+    product = _get_filter_index("products_by_id", data_generator.SHARED_PRODUCTS, _id_map).get(product_id)
 
     if not product:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": f"Product with ID {product_id} not found",
             "data": None
-        }
+        })
 
-    return {
+    return _fast_response({
         "status": "success",
         "msg": "Product details retrieved successfully",
         "data": product
-    }
+    })
 
-@router.get("/products", response_model=StandardResponse)
+@router.get("/products")
 async def list_products(
     limit: int = Query(50, ge=1, le=500),
     offset: int = Query(0, ge=0),
@@ -287,35 +476,44 @@ async def list_products(
     await data_generator.ensure_products_loaded()
 
     if not data_generator.SHARED_PRODUCTS:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": "No products data found. Please generate products first.",
             "data": [],
             "count": 0
-        }
-
-    filtered = data_generator.SHARED_PRODUCTS
-
-    if category:
-        filtered = [p for p in filtered if p.get("category", "").lower() == category.lower()]
-    if brand:
-        filtered = [p for p in filtered if p.get("brand", "").lower() == brand.lower()]
-    if min_price:
-        filtered = [p for p in filtered if p.get("price_vnd", 0) >= min_price]
-    if max_price:
-        filtered = [p for p in filtered if p.get("price_vnd", 0) <= max_price]
-
-    result = filtered[offset:offset + limit]
-
-    return {
+        })
+
+    products = data_generator.SHARED_PRODUCTS
+    index = _get_filter_index("products", products, _build_product_index)
+
+    # Filters are one vectorized mask over the product columns; matching rows
+    # come back in catalog order
+    if category or brand or min_price or max_price:
+        mask = np.ones(len(products), dtype=bool)
+        if category:
+            mask &= index["category"] == index["category_codes"].get(category.lower(), -1)
+        if brand:
+            mask &= index["brand"] == index["brand_codes"].get(brand.lower(), -1)
+        if min_price:
+            mask &= index["price_vnd"] >= min_price
+        if max_price:
+            mask &= index["price_vnd"] <= max_price
+        rows = np.flatnonzero(mask)
+        result = [products[i] for i in rows[offset:offset + limit].tolist()]
+        total = len(rows)
+    else:
+        result = products[offset:offset + limit]
+        total = len(products)
+
+    return _fast_response({
         "status": "success",
         "msg": "Products retrieved successfully",
         "data": result,
         "count": len(result),
-        "total": len(filtered)
-    }
+        "total": total
+    })
 
-@router.get("/employees", response_model=StandardResponse)
+@router.get("/employees")
 async def list_employees(
     limit: int = Query(50, ge=1, le=500),
     offset: int = Query(0, ge=0),
@@ -328,31 +526,33 @@ async def list_employees(
     data_generator.ensure_staff_loaded()
 
     if not data_generator.SHARED_STAFF:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": "No staff data found. Please generate staff first.",
             "data": [],
             "count": 0
-        }
+        })
 
-    filtered = data_generator.SHARED_STAFF
+    staff = data_generator.SHARED_STAFF
 
-    if position:
-        filtered = [s for s in filtered if position.lower() in s.get("position", "").lower()]
+    rows = range(len(staff))
     if status:
-        filtered = [s for s in filtered if s.get("status", "").lower() == status.lower()]
+        status_index = _get_filter_index("staff_status", staff, lambda records: _group_rows(records, "status", str.lower))
+        rows = status_index.get(status.lower(), [])
+    if position:
+        rows = _rows_containing(rows, _lowered_field("staff_position", staff, "position"), position)
 
-    result = filtered[offset:offset + limit]
+    result = [staff[i] for i in rows[offset:offset + limit]]
 
-    return {
+    return _fast_response({
         "status": "success",
         "msg": "Employees retrieved successfully",
         "data": result,
         "count": len(result),
-        "total": len(filtered)
-    }
+        "total": len(rows)
+    })
 
-@router.get("/customers", response_model=StandardResponse)
+@router.get("/customers")
 async def list_customers(
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
@@ -362,55 +562,52 @@ async def list_customers(
     """
     List customers with filtering options
 
-    Note: Customers are stored in batches. This endpoint loads specific batches based on offset.
+    Note: Customers are stored in batches. Offsets and filters apply across all
+    batches; filters use a city/country index and a page only loads the
+    batches it covers.
     """
-    batch_size = 10_000
-    batch_num = offset // batch_size
-    offset_in_batch = offset % batch_size
-
-    # Try new location first
-    customer_dir = data_generator.get_share_data_path("customers")
-    batch_file = FilePath(customer_dir) / f"customers_batch_{batch_num}.json.gz"
-
-    # Fallback to old location
-    if not batch_file.exists():
-        batch_file = data_generator.DATA_DIR / "customers" / f"customers_batch_{batch_num}.json.gz"
+    batch_files = _customer_batch_files()
 
-    if not batch_file.exists():
-        return {
+    if not batch_files:
+        return _fast_response({
             "status": "error",
             "msg": "No customers data found. Please generate customers first.",
             "data": [],
             "count": 0
-        }
-
-    customers = load_compressed(batch_file)
-    if not customers:
-        return {
-            "status": "error",
-            "msg": f"Customer batch {batch_num} not found",
-            "data": [],
-            "count": 0
-        }
-
-    # Apply filters
-    filtered = customers
-    if city:
-        filtered = [c for c in filtered if city.lower() in c.get("city", "").lower()]
-    if country:
-        filtered = [c for c in filtered if country.lower() in c.get("country", "").lower()]
-
-    result = filtered[offset_in_batch:offset_in_batch + limit]
-
-    return {
+        })
+
+    if city or country:
+        index = await _get_customer_index(batch_files)
+        rows = None
+        for field, needle in (("city", city), ("country", country)):
+            if needle:
+                field_rows = _customer_rows_containing(index[field], needle)
+                rows = field_rows if rows is None else np.intersect1d(rows, field_rows, assume_unique=True)
+        total = len(rows)
+        page = rows[offset:offset + limit].tolist()
+    else:
+        # Every batch but the last is full
+        total = (len(batch_files) - 1) * CUSTOMER_BATCH_SIZE + len(load_compressed(batch_files[-1]) or [])
+        page = range(offset, min(offset + limit, total))
+
+    result = []
+    batches = {}
+    for row in page:
+        batch_num, i = divmod(row, CUSTOMER_BATCH_SIZE)
+        if batch_num not in batches:
+            batches[batch_num] = load_compressed(batch_files[batch_num]) or []
+        if i < len(batches[batch_num]):
+            result.append(batches[batch_num][i])
+
+    return _fast_response({
         "status": "success",
         "msg": "Customers retrieved successfully",
         "data": result,
         "count": len(result),
-        "total": len(filtered)
-    }
+        "total": total
+    })
 
-@router.get("/locations", response_model=StandardResponse)
+@router.get("/locations")
 async def list_locations(
     limit: int = Query(50, ge=1, le=100),
     city: Optional[str] = Query(None, description="Filter by city")
@@ -421,28 +618,30 @@ async def list_locations(
     data_generator.ensure_locations_loaded()
 
     if not data_generator.SHARED_LOCATIONS:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": "No locations data found. Please generate locations first.",
             "data": [],
             "count": 0
-        }
+        })
 
-    filtered = data_generator.SHARED_LOCATIONS
+    locations = data_generator.SHARED_LOCATIONS
+
+    rows = range(len(locations))
     if city:
-        filtered = [l for l in filtered if city.lower() in l.get("city", "").lower()]
+        rows = _rows_containing(rows, _lowered_field("locations_city", locations, "city"), city)
 
-    result = filtered[:limit]
+    result = [locations[i] for i in rows[:limit]]
 
-    return {
+    return _fast_response({
         "status": "success",
         "msg": "Locations retrieved successfully",
         "data": result,
         "count": len(result),
-        "total": len(filtered)
-    }
+        "total": len(rows)
+    })
 
-@router.get("/shops", response_model=StandardResponse)
+@router.get("/shops")
 async def list_shops(
     limit: int = Query(50, ge=1, le=100),
     country: Optional[str] = Query(None, description="Filter by country"),
@@ -454,25 +653,28 @@ async def list_shops(
     data_generator.ensure_shops_loaded()
 
     if not data_generator.SHARED_SHOPS:
-        return {
+        return _fast_response({
             "status": "error",
             "msg": "No shops data found. Please generate shops first.",
             "data": [],
             "count": 0
-        }
+        })
 
-    filtered = data_generator.SHARED_SHOPS
-    if country:
-        filtered = [s for s in filtered if country.lower() in s.get("country", "").lower()]
+    shops = data_generator.SHARED_SHOPS
+
+    rows = range(len(shops))
     if currency:
-        filtered = [s for s in filtered if s.get("currency_code", "").upper() == currency.upper()]
+        currency_index = _get_filter_index("shops_currency", shops, lambda records: _group_rows(records, "currency_code", str.upper))
+        rows = currency_index.get(currency.upper(), [])
+    if country:
+        rows = _rows_containing(rows, _lowered_field("shops_country", shops, "country"), country)
 
-    result = filtered[:limit]
+    result = [shops[i] for i in rows[:limit]]
 
-    return {
+    return _fast_response({
         "status": "success",
         "msg": "Shops retrieved successfully",
         "data": result,
         "count": len(result),
-        "total": len(filtered)
-    }
+        "total": len(rows)
+    })
@@ -9,15 +9,17 @@ from pydantic import BaseModel, Field
 from typing import Optional, Any
 from datetime import datetime, timedelta
 import random
+import numpy as np
 import hashlib
 import hmac
-import uuid
+import os
 from pathlib import Path
+import asyncio
 import gzip
-import json
+import orjson
 
 from shared.data_generator import (
-    get_random_customer, generate_transaction_id,
+    generate_transaction_id,
     get_private_data_path, fake_vi, fake_en
 )
 
@@ -27,11 +29,53 @@ router = APIRouter()
 TRANSACTIONS_DIR = get_private_data_path("momo", "")
 TRANSACTIONS_DIR.mkdir(exist_ok=True)
 
+# Aggregates behind /v2/statistics, written with each batch. "source" holds
+# the (mtime_ns, size) of the transactions file they were computed from
+STATS_FILE = TRANSACTIONS_DIR / "stats.json.gz"
+
+# MoMo result codes (success weighted 5 in 10)
+RESULT_CODES = (
+    (0, "Thanh cong"),
+    (0, "Thanh cong"),
+    (0, "Thanh cong"),
+    (0, "Thanh cong"),
+    (0, "Thanh cong"),
+    (9000, "Giao dich da duoc xu ly"),
+    (10, "He thong dang bao tri"),
+    (11, "Truy cap bi tu choi"),
+    (12, "Phien ban API khong duoc ho tro"),
+    (99, "Loi khong xac dinh")
+)
+PAY_TYPES = ("qr", "webApp", "credit", "napas")
+# Store ids TS001-TS050 and promo codes TECH10-TECH99, formatted once so rows
+# share the strings instead of formatting one per transaction
+STORE_IDS = tuple(f"TS{n:03d}" for n in range(1, 51))
+PROMO_CODES = tuple(f"TECH{n}" for n in range(10, 100))
+
 generation_status = {
     "transactions": {"generated": 0, "target": 500, "completed": False},
     "is_generating": False
 }
 
+# gzip level for transactions.json.gz: on 5000 transactions level 3
+# compressed ~5x faster than the default 9 for a file ~19% larger; reads
+# take the same time at either level
+GZIP_COMPRESS_LEVEL = 3
+
+# The closing "]" of a saved array is written as its own gzip member, so an
+# append can cut it off and add a member with the new items instead of
+# rewriting the file. gzip readers decode the members as one stream
+_ARRAY_END_MEMBER = gzip.compress(b"]", mtime=0)
+
+# Parsed archives: path -> (mtime_ns, size, data). Replaced when the file is
+# rewritten, so requests only decode the file after it changes
+_file_cache = {}
+
+# Row position of the first transaction per orderId / requestId, plus columnar
+# arrays of the filter/sort fields. Built from the cached transactions list
+# and rebuilt when load_compressed returns a new list
+_txn_index = {"transactions": None, "by_order": {}, "by_request": {}}
+
 # Standard Response Model
 class StandardResponse(BaseModel):
     status: str = Field(..., example="success")
@@ -42,14 +86,121 @@ class StandardResponse(BaseModel):
 
 # Helper functions
 def save_compressed(data, filepath):
-    with gzip.open(filepath, 'wt', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False)
+    with open(filepath, 'wb') as f:
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=GZIP_COMPRESS_LEVEL) as gz:
+            gz.write(memoryview(orjson.dumps(data))[:-1])
+        f.write(_ARRAY_END_MEMBER)
+
+def append_compressed(items, filepath):
+    """Append items to a non-empty array saved by save_compressed; False if the file wasn't written that way"""
+    with open(filepath, 'r+b') as f:
+        end = f.seek(0, os.SEEK_END) - len(_ARRAY_END_MEMBER)
+        if end < 0:
+            return False
+        f.seek(end)
+        if f.read(len(_ARRAY_END_MEMBER)) != _ARRAY_END_MEMBER:
+            return False
+        f.seek(end)
+        f.truncate()
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=GZIP_COMPRESS_LEVEL) as gz:
+            gz.write(b",")
+            gz.write(memoryview(orjson.dumps(items))[1:-1])
+        f.write(_ARRAY_END_MEMBER)
+    return True
 
 def load_compressed(filepath):
-    if not filepath.exists():
+    try:
+        stat = filepath.stat()
+    except FileNotFoundError:
+        return None
+    cached = _file_cache.get(filepath)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        # Callers only read the returned list, so the cached object can be shared
+        return cached[2]
+    with gzip.open(filepath, 'rb') as f:
+        data = orjson.loads(f.read())
+    _file_cache[filepath] = (stat.st_mtime_ns, stat.st_size, data)
+    return data
+
+def _get_txn_index(transactions):
+    """Return the lookup index for this transactions list, building it if needed"""
+    global _txn_index
+    if _txn_index["transactions"] is not transactions:
+        by_order, by_request = {}, {}
+        for i, t in enumerate(transactions):
+            by_order.setdefault(t.get("orderId"), i)
+            by_request.setdefault(t.get("requestId"), i)
+        n = len(transactions)
+        _txn_index = {
+            "transactions": transactions,
+            "by_order": by_order,
+            "by_request": by_request,
+            # Missing fields get the defaults the per-row filters used (a
+            # missing resultCode is stored as -1, which no real code uses)
+            "result_code": np.fromiter((t.get("resultCode", -1) for t in transactions), dtype=np.int64, count=n),
+            "amount": np.fromiter((t.get("amount", 0) for t in transactions), dtype=np.int64, count=n),
+            "response_time": np.fromiter((t.get("responseTime", 0) for t in transactions), dtype=np.int64, count=n),
+            "response_time_iso": np.array([t.get("responseTimeISO", "") for t in transactions], dtype=str)
+        }
+    return _txn_index
+
+def _compute_statistics(transactions):
+    """Aggregate the statistics counters over a list of transactions"""
+    n = len(transactions)
+    result_code = np.fromiter((t.get("resultCode", -1) for t in transactions), dtype=np.int64, count=n)
+    amount = np.fromiter((t.get("amount", 0) for t in transactions), dtype=np.int64, count=n)
+    successful = np.flatnonzero(result_code == 0)
+    amount = amount[successful]
+
+    # Group successful rows by payType, keeping the order types first appear in
+    pay_types = np.array([transactions[i].get("payType", "unknown") for i in successful], dtype=object)
+    names, first, codes = np.unique(pay_types, return_index=True, return_inverse=True)
+    counts = np.bincount(codes, minlength=len(names))
+    totals = np.zeros(len(names), dtype=np.int64)
+    np.add.at(totals, codes, amount)
+
+    return {
+        "total_transactions": n,
+        "successful_transactions": len(successful),
+        "total_amount_vnd": int(amount.sum()),
+        "by_pay_type": {
+            names[k]: {"count": int(counts[k]), "total": int(totals[k])}
+            for k in np.argsort(first)
+        }
+    }
+
+def _merge_statistics(stats, more):
+    """Combine the counters of two consecutive transaction lists"""
+    pay_type_stats = {k: dict(v) for k, v in stats["by_pay_type"].items()}
+    for pay_type, v in more["by_pay_type"].items():
+        if pay_type not in pay_type_stats:
+            pay_type_stats[pay_type] = {"count": 0, "total": 0}
+        pay_type_stats[pay_type]["count"] += v["count"]
+        pay_type_stats[pay_type]["total"] += v["total"]
+    return {
+        "total_transactions": stats["total_transactions"] + more["total_transactions"],
+        "successful_transactions": stats["successful_transactions"] + more["successful_transactions"],
+        "total_amount_vnd": stats["total_amount_vnd"] + more["total_amount_vnd"],
+        "by_pay_type": pay_type_stats
+    }
+
+def _file_signature(filepath):
+    try:
+        stat = filepath.stat()
+    except FileNotFoundError:
         return None
-    with gzip.open(filepath, 'rt', encoding='utf-8') as f:
-        return json.load(f)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def load_statistics(batch_file):
+    """Saved statistics for batch_file, or None if they are missing or stale"""
+    stats = load_compressed(STATS_FILE)
+    if stats and stats.get("source") == _file_signature(batch_file):
+        return stats
+    return None
+
+def save_statistics(stats, batch_file):
+    with gzip.open(STATS_FILE, 'wb') as f:
+        f.write(orjson.dumps({**stats, "source": _file_signature(batch_file)}))
 
 def generate_momo_request_id():
     """Generate MoMo request ID"""
@@ -67,52 +218,71 @@ def generate_transactions_batch(count):
     """Generate MoMo transactions with realistic structure"""
     transactions = []
 
-    # MoMo result codes
-    result_codes = [
-        (0, "Thanh cong"),
-        (0, "Thanh cong"),
-        (0, "Thanh cong"),
-        (0, "Thanh cong"),
-        (0, "Thanh cong"),
-        (9000, "Giao dich da duoc xu ly"),
-        (10, "He thong dang bao tri"),
-        (11, "Truy cap bi tu choi"),
-        (12, "Phien ban API khong duoc ho tro"),
-        (99, "Loi khong xac dinh")
+    # Amount buckets (inclusive): small, medium, large and very large
+    amount_low = np.array([10000, 100000, 500000, 2000000])
+    amount_high = np.array([100000, 500000, 2000000, 10000000])
+
+    # Draw every per-row random column up front in NumPy; the loop below only
+    # indexes into them (tolist() gives plain Python values for JSON output)
+    rng = np.random.default_rng()
+    # Same 1..2,000,000 id range as get_random_customer()
+    customer_ids = rng.integers(1, 2_000_001, count).tolist()
+    result_code_idx = rng.integers(0, len(RESULT_CODES), count).tolist()
+    buckets = rng.integers(0, len(amount_low), count)
+    amounts = rng.integers(amount_low[buckets], amount_high[buckets] + 1)
+    # Round to 1000 VND (half to even, like round())
+    amounts = (np.round(amounts / 1000) * 1000).astype(np.int64).tolist()
+    trans_ids = rng.integers(2000000000000, 3000000000000, count).tolist()
+    # 0-90 days, 0-23 hours and 0-59 minutes back, in seconds
+    age_seconds = (
+        rng.integers(0, 91, count) * 86400
+        + rng.integers(0, 24, count) * 3600
+        + rng.integers(0, 60, count) * 60
+    ).tolist()
+    pay_type_idx = rng.integers(0, len(PAY_TYPES), count).tolist()
+    store_idx = rng.integers(0, len(STORE_IDS), count).tolist()
+    has_qr_code = (rng.random(count) > 0.5).tolist()
+    has_refund = (rng.random(count) <= 0.1).tolist()
+    refund_is_half = (rng.random(count) > 0.5).tolist()
+    refund_trans_ids = rng.integers(2000000000000, 3000000000000, count).tolist()
+    refund_days = rng.integers(1, 8, count).tolist()
+    has_promotion = (rng.random(count) > 0.8).tolist()
+    promo_idx = rng.integers(0, len(PROMO_CODES), count).tolist()
+    promo_rates = np.where(rng.random(count) > 0.7, rng.uniform(0.05, 0.15, count), 0.0).tolist()
+    base_dt = datetime.now()
+    # Order/request ids share the batch's timestamp prefix (same formats as
+    # generate_momo_order_id / generate_momo_request_id)
+    order_prefix = f"ORD{base_dt.strftime('%Y%m%d')}"
+    request_prefix = f"MOMO{base_dt.strftime('%Y%m%d%H%M%S')}"
+    order_ids = [f"{order_prefix}{n}" for n in rng.integers(10000000, 100000000, count).tolist()]
+    request_ids = [f"{request_prefix}{n}" for n in rng.integers(100000, 1000000, count).tolist()]
+    # 32 random hex chars per payUrl token and per qrCodeUrl token, from one
+    # urandom read per batch
+    url_tokens = os.urandom(32 * count).hex()
+
+    # Mock signatures are hashed in one pass over the id/amount columns
+    sha256 = hashlib.sha256
+    signatures = [
+        sha256(f"{trans_id}{order_id}{amount}".encode()).hexdigest()
+        for trans_id, order_id, amount in zip(trans_ids, order_ids, amounts)
     ]
 
-    # Payment types
-    pay_types = ["qr", "webApp", "credit", "napas"]
-
     for i in range(count):
-        customer = get_random_customer()
         transaction_id = generate_transaction_id()
-        result_code, message = random.choice(result_codes)
-
-        amount = random.choice([
-            random.randint(10000, 100000),      # Small transactions
-            random.randint(100000, 500000),     # Medium transactions
-            random.randint(500000, 2000000),    # Large transactions
-            random.randint(2000000, 10000000),  # Very large transactions
-        ])
-        # Round to 1000 VND
-        amount = round(amount / 1000) * 1000
-
-        trans_id = generate_momo_trans_id()
-        order_id = generate_momo_order_id()
-        request_id = generate_momo_request_id()
-
-        response_time = datetime.now() - timedelta(
-            days=random.randint(0, 90),
-            hours=random.randint(0, 23),
-            minutes=random.randint(0, 59)
-        )
+        result_code, message = RESULT_CODES[result_code_idx[i]]
+        amount = amounts[i]
+
+        trans_id = trans_ids[i]
+        order_id = order_ids[i]
+        request_id = request_ids[i]
+
+        response_time = base_dt - timedelta(seconds=age_seconds[i])
 
         # Generate MoMo response structure (based on real API)
         transaction = {
             # Internal tracking
             "transaction_id": transaction_id,
-            "customer_id": customer["id"],
+            "customer_id": customer_ids[i],
             "source": "momo",
 
             # MoMo API Response fields
@@ -125,39 +295,39 @@ def generate_transactions_batch(count):
             "transId": trans_id,
             "resultCode": result_code,
             "message": message,
-            "payType": random.choice(pay_types),
+            "payType": PAY_TYPES[pay_type_idx[i]],
             "responseTime": int(response_time.timestamp() * 1000),
             "responseTimeISO": response_time.isoformat(),
 
             # Extra info (as in real MoMo response)
             "extraData": {
-                "store_id": f"TS{random.randint(1, 50):03d}",
+                "store_id": STORE_IDS[store_idx[i]],
                 "customer_phone": fake_vi.phone_number(),
                 "customer_name": fake_vi.name()
             },
 
             # Signature (mock)
-            "signature": hashlib.sha256(f"{trans_id}{order_id}{amount}".encode()).hexdigest(),
+            "signature": signatures[i],
 
             # Payment URL (for QR/Web payments)
-            "payUrl": f"https://test-payment.momo.vn/v2/gateway/pay?token={uuid.uuid4().hex}" if result_code == 0 else None,
-            "qrCodeUrl": f"https://test-payment.momo.vn/v2/gateway/qr/{uuid.uuid4().hex}" if result_code == 0 and random.random() > 0.5 else None,
+            "payUrl": f"https://test-payment.momo.vn/v2/gateway/pay?token={url_tokens[64 * i:64 * i + 32]}" if result_code == 0 else None,
+            "qrCodeUrl": f"https://test-payment.momo.vn/v2/gateway/qr/{url_tokens[64 * i + 32:64 * i + 64]}" if result_code == 0 and has_qr_code[i] else None,
 
             # Refund info (if applicable)
-            "refundTrans": [] if random.random() > 0.1 else [{
+            "refundTrans": [{
                 "orderId": f"RF{order_id}",
-                "amount": int(amount * 0.5) if random.random() > 0.5 else amount,
+                "amount": int(amount * 0.5) if refund_is_half[i] else amount,
                 "resultCode": 0,
-                "transId": generate_momo_trans_id(),
-                "createdTime": int((response_time + timedelta(days=random.randint(1, 7))).timestamp() * 1000)
-            }],
+                "transId": refund_trans_ids[i],
+                "createdTime": int((response_time + timedelta(days=refund_days[i])).timestamp() * 1000)
+            }] if has_refund[i] else [],
 
             # Promotion info
             "promotionInfo": [{
-                "promoCode": f"TECH{random.randint(10, 99)}",
-                "promoAmount": int(amount * random.uniform(0.05, 0.15)) if random.random() > 0.7 else 0,
+                "promoCode": PROMO_CODES[promo_idx[i]],
+                "promoAmount": int(amount * promo_rates[i]),
                 "promoDescription": "Khuyen mai TechStore"
-            }] if random.random() > 0.8 else []
+            }] if has_promotion[i] else []
         }
         transactions.append(transaction)
 
@@ -170,24 +340,31 @@ def generate_all_transactions(count=500, mode="replace"):
     new_transactions = generate_transactions_batch(count)
     batch_file = TRANSACTIONS_DIR / "transactions.json.gz"
 
-    if mode == "append":
-        existing = load_compressed(batch_file)
-        if existing:
-            all_transactions = existing + new_transactions
-            print(f"Appending {count} new transactions to {len(existing)} existing")
-        else:
-            all_transactions = new_transactions
+    stats = _compute_statistics(new_transactions)
+
+    # Appending only writes the new rows; files from before the split closing
+    # member (or an empty array) fall back to rewriting everything
+    existing = load_compressed(batch_file) if mode == "append" else None
+    if existing:
+        stats = _merge_statistics(load_statistics(batch_file) or _compute_statistics(existing), stats)
+    if existing and append_compressed(new_transactions, batch_file):
+        print(f"Appending {count} new transactions to {len(existing)} existing")
+        total = len(existing) + count
+    elif existing:
+        print(f"Appending {count} new transactions to {len(existing)} existing")
+        save_compressed(existing + new_transactions, batch_file)
+        total = len(existing) + count
     else:
-        all_transactions = new_transactions
+        save_compressed(new_transactions, batch_file)
+        total = count
+    save_statistics(stats, batch_file)
 
-    save_compressed(all_transactions, batch_file)
-
-    generation_status["transactions"]["generated"] = len(all_transactions)
-    generation_status["transactions"]["target"] = len(all_transactions)
+    generation_status["transactions"]["generated"] = total
+    generation_status["transactions"]["target"] = total
     generation_status["transactions"]["completed"] = True
-    print(f"MoMo transaction generation completed! Total: {len(all_transactions)}")
+    print(f"MoMo transaction generation completed! Total: {total}")
 
-    return all_transactions
+    return total
 
 # API Endpoints - Following MoMo API structure
 @router.get("/", response_model=StandardResponse)
@@ -235,15 +412,15 @@ async def query_transaction(
             }
         }
 
-    # Search by orderId or requestId
-    found = None
-    for t in transactions:
-        if orderId and t.get("orderId") == orderId:
-            found = t
-            break
-        if requestId and t.get("requestId") == requestId:
-            found = t
-            break
+    # Search by orderId or requestId; when both are given the earlier row in
+    # the file wins, as with a scan checking either id per row
+    index = _get_txn_index(transactions)
+    rows = []
+    if orderId and orderId in index["by_order"]:
+        rows.append(index["by_order"][orderId])
+    if requestId and requestId in index["by_request"]:
+        rows.append(index["by_request"][requestId])
+    found = transactions[min(rows)] if rows else None
 
     if not found:
         return {
@@ -299,74 +476,75 @@ async def get_transactions(
             "count": 0
         }
 
-    # Apply filters
-    filtered = transactions
+    # Apply filters as one vectorized mask over the cached columns
+    index = _get_txn_index(transactions)
+    mask = np.ones(len(transactions), dtype=bool)
 
     if status is not None:
-        filtered = [t for t in filtered if t.get("resultCode") == status]
+        mask &= index["result_code"] == status
 
     if start_date:
-        filtered = [t for t in filtered if t.get("responseTimeISO", "") >= start_date]
+        mask &= index["response_time_iso"] >= start_date
 
     if end_date:
-        filtered = [t for t in filtered if t.get("responseTimeISO", "") <= end_date]
+        mask &= index["response_time_iso"] <= end_date
 
     if min_amount:
-        filtered = [t for t in filtered if t.get("amount", 0) >= min_amount]
+        mask &= index["amount"] >= min_amount
 
     if max_amount:
-        filtered = [t for t in filtered if t.get("amount", 0) <= max_amount]
+        mask &= index["amount"] <= max_amount
 
-    # Sort by response time descending
-    filtered.sort(key=lambda x: x.get("responseTime", 0), reverse=True)
-    result = filtered[:limit]
+    # Sort by response time descending; a stable sort keeps equal times in file order
+    rows = np.flatnonzero(mask)
+    rows = rows[np.argsort(-index["response_time"][rows], kind="stable")]
+    result = [transactions[i] for i in rows[:limit].tolist()]
 
     return {
         "status": "success",
         "msg": "Transactions retrieved successfully",
         "data": result,
         "count": len(result),
-        "total": len(filtered)
+        "total": len(rows)
     }
 
 @router.get("/v2/statistics", response_model=StandardResponse)
 async def get_statistics():
     """Get MoMo transaction statistics"""
     batch_file = TRANSACTIONS_DIR / "transactions.json.gz"
-    transactions = load_compressed(batch_file)
 
-    if not transactions:
+    # Served from the aggregates saved with the batch; recomputed (and saved
+    # again) when the transactions file was changed some other way
+    stats = load_statistics(batch_file)
+    if stats is None:
+        transactions = load_compressed(batch_file)
+        if transactions:
+            stats = _compute_statistics(transactions)
+            save_statistics(stats, batch_file)
+
+    if not stats or not stats["total_transactions"]:
         return {
             "status": "error",
             "msg": "No transactions data",
             "data": None
         }
 
-    # Calculate statistics
-    successful = [t for t in transactions if t.get("resultCode") == 0]
-    total_amount = sum(t.get("amount", 0) for t in successful)
-    avg_amount = total_amount / len(successful) if successful else 0
-
-    # Group by pay type
-    pay_type_stats = {}
-    for t in successful:
-        pay_type = t.get("payType", "unknown")
-        if pay_type not in pay_type_stats:
-            pay_type_stats[pay_type] = {"count": 0, "total": 0}
-        pay_type_stats[pay_type]["count"] += 1
-        pay_type_stats[pay_type]["total"] += t.get("amount", 0)
+    total = stats["total_transactions"]
+    successful = stats["successful_transactions"]
+    total_amount = stats["total_amount_vnd"]
+    avg_amount = total_amount / successful if successful else 0
 
     return {
         "status": "success",
         "msg": "Statistics retrieved successfully",
         "data": {
-            "total_transactions": len(transactions),
-            "successful_transactions": len(successful),
-            "failed_transactions": len(transactions) - len(successful),
+            "total_transactions": total,
+            "successful_transactions": successful,
+            "failed_transactions": total - successful,
             "total_amount_vnd": total_amount,
             "average_amount_vnd": int(avg_amount),
-            "success_rate": round(len(successful) / len(transactions) * 100, 2) if transactions else 0,
-            "by_pay_type": pay_type_stats
+            "success_rate": round(successful / total * 100, 2) if total else 0,
+            "by_pay_type": stats["by_pay_type"]
         }
     }
 
@@ -381,14 +559,21 @@ async def generate_transactions_endpoint(
     """Generate MoMo transactions"""
     try:
         batch_file = TRANSACTIONS_DIR / "transactions.json.gz"
-        existing = load_compressed(batch_file)
+        # The saved statistics carry the row count; only decode the file
+        # (off the event loop) when they are missing or stale
+        stats = load_statistics(batch_file)
+        if stats is not None:
+            existing_count = stats["total_transactions"]
+        else:
+            existing = await asyncio.to_thread(load_compressed, batch_file)
+            existing_count = len(existing) if existing else 0
 
-        if existing and method != "new":
+        if existing_count and method != "new":
             return {
                 "status": "warning",
                 "msg": "Transactions exist. Use 'method=new' to append new data.",
-                "data": {"count": len(existing)},
-                "count": len(existing)
+                "data": {"count": existing_count},
+                "count": existing_count
             }
 
         if generation_status["is_generating"]:
@@ -639,6 +639,14 @@ def generate_transaction_id():
     TRANSACTION_ID_COUNTER += 1
     return f"TXN{datetime.now().strftime('%Y%m%d')}{str(TRANSACTION_ID_COUNTER).zfill(8)}"
 
+def generate_transaction_ids(count):
+    """Reserve a block of consecutive transaction IDs in one step"""
+    global TRANSACTION_ID_COUNTER
+    first = TRANSACTION_ID_COUNTER + 1
+    TRANSACTION_ID_COUNTER += count
+    date = datetime.now().strftime('%Y%m%d')
+    return [f"TXN{date}{str(n).zfill(8)}" for n in range(first, first + count)]
+
 def get_random_product():
     """Get random product from shared catalog"""
     ensure_products_loaded()
@@ -730,9 +738,17 @@ async def initialize_shared_data():
     if not shops_file.exists():
         shops_file = DATA_DIR / "odoo_shops.json.gz"
 
+    # Decompress and parse the four files concurrently in worker threads
+    # (gzip releases the GIL) so startup waits for the largest one rather than
+    # all of them in turn
+    products_data, staff_data, locations_data, shops_data = await asyncio.gather(*(
+        asyncio.to_thread(load_compressed, f)
+        for f in (products_file, staff_file, locations_file, shops_file)
+    ))
+
     if products_file.exists():
         print("Loading existing products...")
-        SHARED_PRODUCTS = load_compressed(products_file)
+        SHARED_PRODUCTS = products_data
         GENERATION_STATUS["products"]["generated"] = True
         GENERATION_STATUS["products"]["count"] = len(SHARED_PRODUCTS)
         print(f"Loaded {len(SHARED_PRODUCTS)} products from file")
@@ -741,7 +757,7 @@ async def initialize_shared_data():
 
     if staff_file.exists():
         print("Loading existing staff...")
-        SHARED_STAFF = load_compressed(staff_file)
+        SHARED_STAFF = staff_data
         GENERATION_STATUS["staff"]["generated"] = True
         GENERATION_STATUS["staff"]["count"] = len(SHARED_STAFF)
         print(f"Loaded {len(SHARED_STAFF)} staff members from file")
@@ -750,7 +766,7 @@ async def initialize_shared_data():
 
     if locations_file.exists():
         print("Loading existing locations...")
-        SHARED_LOCATIONS = load_compressed(locations_file)
+        SHARED_LOCATIONS = locations_data
         GENERATION_STATUS["locations"]["generated"] = True
         GENERATION_STATUS["locations"]["count"] = len(SHARED_LOCATIONS)
         print(f"Loaded {len(SHARED_LOCATIONS)} locations from file")
@@ -759,7 +775,7 @@ async def initialize_shared_data():
 
     if shops_file.exists():
         print("Loading existing shops...")
-        SHARED_SHOPS = load_compressed(shops_file)
+        SHARED_SHOPS = shops_data
         GENERATION_STATUS["shops"]["generated"] = True
         GENERATION_STATUS["shops"]["count"] = len(SHARED_SHOPS)
         print(f"Loaded {len(SHARED_SHOPS)} shops from file")